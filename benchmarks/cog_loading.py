@@ -0,0 +1,74 @@
+"""Time loading and reloading each extension in ``nicbot/cogs``, both with
+discord.py's ``reload_extension`` and with the state-keeping
+:func:`nicbot.utils.hot_reload_extension` that ``!reload`` uses.
+
+Usage::
+
+    python benchmarks/cog_loading.py [--repeat 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import pathlib
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from nicbot.bot import NicBot, loadable_cog_extension  # noqa: E402
+from nicbot.utils import hot_reload_extension  # noqa: E402
+
+
+async def run(repeat: int) -> None:
+    cogs = pathlib.Path(__file__).parents[1].joinpath("nicbot", "cogs")
+    names = sorted(
+        "." + p.name.removesuffix(".py")
+        for p in cogs.iterdir()
+        if loadable_cog_extension(p.name)
+    )
+
+    print(f"{'extension':<12} {'load':>10} {'reload':>10} {'hot reload':>10}")
+
+    async with NicBot() as bot:
+        for name in names:
+            loads, reloads, hot_reloads = [], [], []
+
+            for _ in range(repeat):
+                start = time.perf_counter()
+                await bot.load_extension(name, package="nicbot.cogs")
+                loads.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                await bot.reload_extension(name, package="nicbot.cogs")
+                reloads.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                await hot_reload_extension(bot, name, package="nicbot.cogs")
+                hot_reloads.append(time.perf_counter() - start)
+
+                await bot.unload_extension(name, package="nicbot.cogs")
+
+            print(
+                f"{name:<12} "
+                f"{statistics.median(loads) * 1000:>7.2f} ms "
+                f"{statistics.median(reloads) * 1000:>7.2f} ms "
+                f"{statistics.median(hot_reloads) * 1000:>7.2f} ms"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    # Loading logs at INFO; keep the table readable.
+    logging.disable(logging.WARNING)
+    asyncio.run(run(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
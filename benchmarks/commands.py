@@ -0,0 +1,291 @@
+"""Benchmark the dictionary commands end to end, without Discord.
+
+Each scenario calls a command's callback with a fake
+:class:`discord.ext.commands.Context` (so checks, rate limits and the
+gateway are skipped), against a :class:`nicbot.stub.StubJishoServer`
+instead of jisho.org, and measures:
+
+- the latency of a single invocation (p50/p95),
+- the throughput with ``--concurrency`` invocations in flight, and
+- the peak memory an invocation allocates, with :mod:`tracemalloc`.
+
+"cold" scenarios have no lookup cache, so every invocation goes through
+HTTP and parsing; "warm" scenarios are answered from the in-memory cache,
+leaving embed building, rendering and file I/O. Both cycle through a
+fixed set of queries, so the warm cache holds every one of them.
+
+Usage::
+
+    python benchmarks/commands.py                # compare to the baseline
+    python benchmarks/commands.py --save         # record a new baseline
+    python benchmarks/commands.py --only kotd    # run matching scenarios
+
+The baseline is machine-specific, so it isn't committed: record one with
+``--save`` on the machine you compare on (e.g., before making a change).
+The exit status is 1 when a scenario regressed by more than
+``--tolerance``; timings on a busy machine vary, so rerun before trusting
+a regression.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import itertools
+import json
+import pathlib
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+from typing import Any, Awaitable, Callable
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from nicbot.assets import jlpt_index  # noqa: E402
+from nicbot.bot import NicBot  # noqa: E402
+from nicbot.cache import LookupCache  # noqa: E402
+from nicbot.cogs.jisho import Jisho  # noqa: E402
+from nicbot.cogs.kotd import KanjiOfTheDay  # noqa: E402
+from nicbot.dictionary import DictionaryClient  # noqa: E402
+from nicbot.stub import StubJishoServer  # noqa: E402
+
+QUERIES = 24
+WARMUP = 3 * QUERIES
+
+BASELINE = pathlib.Path(__file__).parent.joinpath("baselines", "commands.json")
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self) -> None:
+        self.id = next(self._ids)
+
+    async def edit(self, **kwargs: Any) -> FakeMessage:
+        return self
+
+
+class FakeContext:
+    """Just enough of :class:`commands.Context` for the cogs' commands."""
+
+    def __init__(self, author_id: int = 1) -> None:
+        self.author = types.SimpleNamespace(id=author_id, name="benchmark")
+        self.guild = None
+        self.replies: list[dict[str, Any]] = []
+
+    async def reply(self, content: str | None = None, **kwargs: Any) -> Any:
+        self.replies.append({"content": content, **kwargs})
+
+        if (file := kwargs.get("file")) is not None:
+            # Read the attachment like discord.py would when uploading it.
+            file.fp.read()
+
+        return FakeMessage()
+
+    send = reply
+
+
+@dataclasses.dataclass(slots=True)
+class Result:
+    p50_ms: float
+    p95_ms: float
+    throughput: float
+    peak_kib: float
+
+    def regressions(self, baseline: Result, tolerance: float) -> list[str]:
+        """Describe every measurement that is worse than ``baseline``."""
+        worse = []
+
+        for name in ("p50_ms", "p95_ms", "peak_kib"):
+            before, after = getattr(baseline, name), getattr(self, name)
+            if after > before * (1 + tolerance):
+                worse.append(f"{name} {before:.2f} -> {after:.2f}")
+
+        if self.throughput < baseline.throughput * (1 - tolerance):
+            worse.append(
+                f"throughput {baseline.throughput:.0f} -> "
+                f"{self.throughput:.0f}"
+            )
+
+        return worse
+
+
+type Invoke = Callable[[FakeContext], Awaitable[None]]
+
+
+def scenarios(bot: NicBot) -> dict[str, Invoke]:
+    kotd = KanjiOfTheDay(bot)
+    jisho = Jisho(bot)
+
+    # Cycle through real kanji so the stroke order images exist, without
+    # leaving the choice up to `random`. Words are distinct too, so
+    # concurrent invocations can't all share one request.
+    kanji = itertools.cycle(jlpt_index().kanji("N5")[:QUERIES])
+    words = itertools.cycle([f"word{i}" for i in range(QUERIES)])
+
+    async def run_kotd(ctx: FakeContext) -> None:
+        await kotd.kotd.callback(kotd, ctx, next(kanji))  # type: ignore
+
+    async def run_jisho_kanji(ctx: FakeContext) -> None:
+        query = "".join(itertools.islice(kanji, 3))
+        await jisho.kanji.callback(jisho, ctx, query)  # type: ignore
+
+    async def run_jisho_word(ctx: FakeContext) -> None:
+        await jisho.word.callback(jisho, ctx, next(words))  # type: ignore
+
+    return {
+        "kotd": run_kotd,
+        "jisho kanji": run_jisho_kanji,
+        "jisho word": run_jisho_word,
+    }
+
+
+async def measure(invoke: Invoke, iterations: int, concurrency: int) -> Result:
+    # Warm up (and, with a cache, fill it).
+    for _ in range(WARMUP):
+        await invoke(FakeContext())
+
+    latencies = []
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await invoke(FakeContext())
+        latencies.append(time.perf_counter() - start)
+
+    # A single burst is over in milliseconds, so keep the best of a few,
+    # like `timeit` does.
+    rounds = []
+
+    for _ in range(5):
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(invoke(FakeContext(author_id=i)) for i in range(concurrency))
+        )
+        rounds.append(time.perf_counter() - start)
+
+    throughput = concurrency / min(rounds)
+
+    peaks = []
+    tracemalloc.start()
+
+    for _ in range(20):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        await invoke(FakeContext())
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+
+    tracemalloc.stop()
+
+    quantiles = statistics.quantiles(latencies, n=20)
+    return Result(
+        p50_ms=statistics.median(latencies) * 1000,
+        p95_ms=quantiles[18] * 1000,
+        throughput=throughput,
+        peak_kib=statistics.median(peaks) / 1024,
+    )
+
+
+async def run(args: argparse.Namespace) -> dict[str, Result]:
+    results = {}
+
+    async with StubJishoServer(latency=args.latency) as server:
+        for warm in (False, True):
+            bot = NicBot()
+            await bot.dictionary.close()
+            bot.dictionary = DictionaryClient(
+                base_url=server.url,
+                # Measure the bot, not the pacing meant to protect jisho.org.
+                requests_per_second=None,
+                max_concurrency=args.concurrency,
+                cache=LookupCache(None) if warm else None,
+            )
+            bot.renders = LookupCache(None) if warm else None
+
+            try:
+                for name, invoke in scenarios(bot).items():
+                    name = f"{name} ({'warm' if warm else 'cold'})"
+
+                    if args.only and args.only not in name:
+                        continue
+
+                    results[name] = await measure(
+                        invoke, args.iterations, args.concurrency
+                    )
+            finally:
+                await bot.dictionary.close()
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--latency",
+        help="Seconds the stub server waits before answering",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument("--only", help="Only run scenarios containing this")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE)
+    parser.add_argument(
+        "--tolerance",
+        help="How much worse than the baseline a measurement may be",
+        type=float,
+        default=0.5,
+    )
+    parser.add_argument(
+        "--save",
+        help="Record the results as the new baseline",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    baseline = {}
+    if args.baseline.exists() and not args.save:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = {k: Result(**v) for k, v in json.load(f).items()}
+    elif not args.save:
+        print(f"No baseline at {args.baseline}; record one with --save")
+
+    print(
+        f"{'scenario':<20} {'p50':>9} {'p95':>9} {'throughput':>12} "
+        f"{'peak memory':>12}"
+    )
+
+    regressed = False
+
+    for name, result in results.items():
+        print(
+            f"{name:<20} {result.p50_ms:>6.2f} ms {result.p95_ms:>6.2f} ms "
+            f"{result.throughput:>8.0f} / s {result.peak_kib:>8.1f} KiB"
+        )
+
+        if (before := baseline.get(name)) is not None:
+            for regression in result.regressions(before, args.tolerance):
+                print(f"  regressed: {regression}")
+                regressed = True
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {k: dataclasses.asdict(v) for k, v in results.items()},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"Saved the baseline to {args.baseline}")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
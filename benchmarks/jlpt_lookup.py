@@ -0,0 +1,70 @@
+"""Compare finding a kanji's JLPT level by scanning the lists in
+``data/kanji.json`` (what the kotd cog used to do) with :class:`JLPTIndex`.
+
+Usage::
+
+    python benchmarks/jlpt_lookup.py
+"""
+
+from __future__ import annotations
+
+import json
+import pathlib
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from nicbot.assets import data_path, jlpt_index  # noqa: E402
+
+
+def linear_level(kanji_lists: dict[str, list[str]], kanji: str) -> str:
+    for key, value in kanji_lists.items():
+        if kanji in value:
+            return key
+    return "None"
+
+
+def main() -> None:
+    with open(data_path("kanji.json"), "r", encoding="utf-8") as f:
+        kanji_lists = json.load(f)
+
+    index = jlpt_index()
+
+    # The last N1 kanji is the worst case for the scan, and a kanji that
+    # isn't listed at all has to be compared against every entry.
+    cases = {
+        "first N5": kanji_lists["N5"][0],
+        "last N1": kanji_lists["N1"][-1],
+        "unlisted": "𠮷",
+    }
+
+    print(f"{'case':<10} {'linear scan':>14} {'JLPTIndex':>14} {'speedup':>9}")
+
+    for name, kanji in cases.items():
+        number, _ = timeit.Timer(
+            lambda: linear_level(kanji_lists, kanji)
+        ).autorange()
+        before = min(
+            timeit.repeat(
+                lambda: linear_level(kanji_lists, kanji),
+                number=number,
+                repeat=5,
+            )
+        )
+        before /= number
+
+        number, _ = timeit.Timer(lambda: index.level(kanji)).autorange()
+        after = min(
+            timeit.repeat(lambda: index.level(kanji), number=number, repeat=5)
+        )
+        after /= number
+
+        print(
+            f"{name:<10} {before * 1e9:>11.0f} ns {after * 1e9:>11.0f} ns "
+            f"{before / after:>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
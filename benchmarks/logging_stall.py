@@ -0,0 +1,112 @@
+"""Compare how long the event loop is stalled by logging when records are
+written on the loop's thread versus handed to a background thread.
+
+A task logs a burst of DEBUG records (roughly what ``-vv`` produces while
+discord.py handles gateway events) while a heartbeat task measures how
+late it wakes up. Logs go to a temporary directory and standard output is
+sent to ``/dev/null``, so the terminal's speed doesn't skew the results.
+
+Usage::
+
+    python benchmarks/logging_stall.py [--records 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from nicbot.logger import start_logging, stop_logging  # noqa: E402
+
+HEARTBEAT = 0.001
+
+
+async def heartbeat(lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT)
+        lags.append(time.perf_counter() - start - HEARTBEAT)
+
+
+async def produce(records: int, calls: list[float]) -> None:
+    log = logging.getLogger("discord.gateway")
+
+    for i in range(records):
+        start = time.perf_counter()
+        log.debug("Dispatching event %s with payload %r", i, {"op": 0})
+        calls.append(time.perf_counter() - start)
+
+        # Yield now and then, like a real event handler would.
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+
+
+async def run(records: int) -> tuple[list[float], list[float]]:
+    lags: list[float] = []
+    calls: list[float] = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    await produce(records, calls)
+    stop.set()
+    await beat
+    return lags, calls
+
+
+def measure(records: int, queue_size: int | None) -> None:
+    with (
+        tempfile.TemporaryDirectory() as directory,
+        open(os.devnull, "w") as devnull,
+        contextlib.redirect_stdout(devnull),
+    ):
+        handler = start_logging(
+            logging.DEBUG,
+            queue_size=queue_size,
+            directory=pathlib.Path(directory),
+        )
+        lags, calls = asyncio.run(run(records))
+
+        # Wait for the writer to finish before removing the directory.
+        stop_logging()
+
+    name = "synchronous" if queue_size is None else f"queue ({queue_size})"
+    calls.sort()
+    print(
+        f"{name:<14} "
+        f"{statistics.fmean(calls) * 1e6:>8.1f} us "
+        f"{calls[int(len(calls) * 0.99)] * 1e6:>8.1f} us "
+        f"{max(lags) * 1e3:>8.2f} ms "
+        f"{sum(calls) * 1e3:>9.1f} ms"
+        + (
+            f"  ({handler.dropped} dropped)"
+            if handler is not None and handler.dropped
+            else ""
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':<14} {'mean call':>11} {'p99 call':>11} "
+        f"{'max lag':>11} {'total':>12}"
+    )
+    measure(args.records, None)
+    measure(args.records, 10_000)
+    measure(args.records, args.records)
+
+
+if __name__ == "__main__":
+    main()
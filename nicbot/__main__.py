@@ -6,7 +6,9 @@ import os
 from typing import TYPE_CHECKING
 
 from .bot import NicBot
+from .gateway import PROFILES
 from .logger import start_logging
+from .shards import parse_shard_ids, run_workers
 
 try:
     import dotenv
@@ -24,6 +26,10 @@ if (DISCORD_TOKEN := os.getenv("DISCORD_TOKEN")) is None:
     raise KeyError("expected environment variable DISCORD_TOKEN to be defined")
 
 
+def shard_count(text: str, /) -> int | None:
+    return None if text == "auto" else int(text)
+
+
 def main() -> None:
     """The main entry point to the program"""
     parser = argparse.ArgumentParser()
@@ -32,9 +38,96 @@ def main() -> None:
         "--verbose",
         help="Logger emits more verbose messages",
         action="count",  # You can stack the flag (e.g., -v == 1, -vv == 2)
+        default=0,
+    )
+    parser.add_argument(
+        "--log-queue-size",
+        help="Most log records to buffer for the background writer thread; "
+        "lower priority records are dropped when it is full",
+        type=int,
+        default=10_000,
+    )
+    parser.add_argument(
+        "--sync-logging",
+        help="Write log records on the calling thread instead of a "
+        "background thread",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--log-max-bytes",
+        help="Start a new log file once the current one reaches this size "
+        "(0 to only rotate daily)",
+        type=int,
+        default=10 * 1024 * 1024,
+    )
+    parser.add_argument(
+        "--log-retention-days",
+        help="Delete rotated log files older than this many days "
+        "(0 to keep them forever)",
+        type=int,
+        default=30,
+    )
+    parser.add_argument(
+        "--log-backup-count",
+        help="Keep at most this many rotated log files (0 for no limit)",
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        "--no-log-compression",
+        help="Leave rotated log files uncompressed",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--log-format",
+        help="Write log messages as plain text or as JSON lines",
+        choices=("text", "json"),
+        default="text",
+    )
+    parser.add_argument(
+        "--gateway-profile",
+        help="Which events to receive from Discord and cache: only what the "
+        "cogs need, or everything (uses much more memory in large guilds)",
+        choices=PROFILES.keys(),
+        default="minimal",
+    )
+    parser.add_argument(
+        "--shard-count",
+        help="The total number of shards, or 'auto' for as many as Discord "
+        "recommends (default: 1)",
+        type=shard_count,
+        default=1,
+    )
+    parser.add_argument(
+        "--shard-ids",
+        help="Only run these shards (e.g., 0-3 or 0,2,4), so the rest can "
+        "run elsewhere; requires a --shard-count",
+        type=parse_shard_ids,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Split the shards across this many processes; requires a "
+        "--shard-count",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--watch",
+        help="Reload cogs whenever their source files change, keeping their "
+        "state (for development)",
+        action="store_true",
     )
     args = parser.parse_args()
 
+    if args.shard_count is None and (args.shard_ids or args.workers > 1):
+        parser.error("--shard-ids and --workers need a --shard-count")
+
+    if args.shard_ids and args.shard_ids[-1] >= args.shard_count:
+        parser.error("--shard-ids must be less than --shard-count")
+
+    if args.watch and args.workers > 1:
+        parser.error("--watch can't be used with --workers")
+
     if args.verbose == 0:
         level = logging.WARNING
     elif args.verbose == 1:
@@ -42,9 +135,36 @@ def main() -> None:
     else:
         level = logging.DEBUG
 
-    start_logging(level)
+    logging_options = dict(
+        level=level,
+        queue_size=None if args.sync_logging else args.log_queue_size,
+        max_bytes=args.log_max_bytes,
+        retention_days=args.log_retention_days,
+        backup_count=args.log_backup_count,
+        compress=not args.no_log_compression,
+        json_lines=args.log_format == "json",
+    )
+    start_logging(**logging_options)
+
+    if args.workers > 1:
+        run_workers(
+            DISCORD_TOKEN,
+            shard_ids=args.shard_ids or list(range(args.shard_count)),
+            shard_count=args.shard_count,
+            workers=args.workers,
+            options={
+                "logging": logging_options,
+                "gateway_profile": args.gateway_profile,
+            },
+        )
+        return
 
-    bot = NicBot()
+    bot = NicBot(
+        profile=PROFILES[args.gateway_profile],
+        shard_count=args.shard_count,
+        shard_ids=args.shard_ids,
+        watch_cogs=args.watch,
+    )
     bot.run(DISCORD_TOKEN, log_handler=None)
 
 
@@ -0,0 +1,212 @@
+"""Locate and load the files in the ``data`` directory.
+
+Paths are resolved relative to the package rather than the current working
+directory, so the bot can be started from anywhere. Assets are loaded the
+first time they are needed and then kept for the life of the process; since
+this module is not part of any extension, that includes across
+``!reload``\\s of the cogs that use them.
+
+To shrink the stroke order images (see :mod:`nicbot.images`) and then pack
+them into a single file (see :mod:`nicbot.pack`)::
+
+    python -m nicbot.assets optimize-strokes
+    python -m nicbot.assets pack-strokes
+
+To render the Kanji of the Day for every JLPT kanji ahead of time::
+
+    python -m nicbot.assets warm-kotd
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import logging
+import pathlib
+import time
+
+from .images import optimize_directory
+from .jlpt import JLPTIndex, load_jlpt_index
+from .pack import AssetPack, build_pack
+
+__all__ = (
+    "DATA_DIR",
+    "data_path",
+    "jlpt_index",
+    "stroke_order_codepoints",
+    "stroke_order_pack",
+)
+
+_log = logging.getLogger(__name__)
+
+# The data directory lives at the same level as the nicbot directory.
+DATA_DIR = pathlib.Path(__file__).resolve().parents[1].joinpath("data")
+
+STROKE_ORDERS_DIR = "stroke_orders"
+STROKE_ORDERS_OPTIMIZED_DIR = "stroke_orders_optimized"
+STROKE_ORDERS_PACK = "stroke_orders.pack"
+
+
+def data_path(*parts: str) -> pathlib.Path:
+    """Return the path to a file in the data directory."""
+    return DATA_DIR.joinpath(*parts)
+
+
+@functools.cache
+def jlpt_index() -> JLPTIndex:
+    """Return the JLPT kanji lists, loading them on first use."""
+    path = data_path("kanji.json")
+    start = time.perf_counter()
+    index = load_jlpt_index(path)
+    elapsed = (time.perf_counter() - start) * 1000
+    _log.debug(f"Loaded {len(index)} kanji from {path} in {elapsed:.2f}ms")
+    return index
+
+
+@functools.cache
+def stroke_order_pack() -> AssetPack | None:
+    """Return the packed stroke order images, or ``None`` if they have not
+    been packed (in which case the loose files should be used)."""
+    path = data_path(STROKE_ORDERS_PACK)
+
+    if not path.exists():
+        _log.debug(f"No stroke order pack found at {path}")
+        return None
+
+    pack = AssetPack(path)
+    _log.debug(f"Mapped {len(pack)} stroke order images from {path}")
+    return pack
+
+
+def stroke_order_codepoints() -> set[int]:
+    """Return the code points of every kanji with a stroke order image."""
+    if (pack := stroke_order_pack()) is not None:
+        keys = pack.keys()
+    else:
+        keys = (p.stem for p in data_path(STROKE_ORDERS_DIR).glob("*.png"))
+
+    # Images are named after the kanji's code point, in hex.
+    return {int(key, 16) for key in keys}
+
+
+def optimize_stroke_orders(args: argparse.Namespace) -> None:
+    report = optimize_directory(
+        data_path(STROKE_ORDERS_DIR),
+        data_path(STROKE_ORDERS_OPTIMIZED_DIR),
+        max_width=args.max_width,
+        workers=args.workers,
+    )
+    print(report)
+
+
+def pack_stroke_orders(args: argparse.Namespace) -> None:
+    source = data_path(STROKE_ORDERS_DIR)
+    optimized = data_path(STROKE_ORDERS_OPTIMIZED_DIR)
+
+    # Entries are keyed by file name without the extension, i.e., the
+    # kanji's code point in hex. Optimized images are used when available.
+    files = sorted(
+        (p.stem, o if (o := optimized.joinpath(p.name)).exists() else p)
+        for p in source.glob("*.png")
+    )
+    count = build_pack(files, args.output)
+    size = args.output.stat().st_size / 1024 / 1024
+    print(f"Packed {count} images into {args.output} ({size:.1f} MiB)")
+
+
+def warm_kotd(args: argparse.Namespace) -> None:
+    # Imported here, since the rest of this module is needed by the bot.
+    from .bot import NicBot
+    from .cogs.kotd import warm_renders
+
+    index = jlpt_index()
+    levels = [level.upper() for level in args.levels] or index.names
+
+    if unknown := [level for level in levels if level not in index.names]:
+        raise SystemExit(f"error: unknown JLPT levels: {', '.join(unknown)}")
+
+    # `!kotd` asks for a kanji either by its level or by itself.
+    kanji = [
+        (k, jlpt)
+        for level in levels
+        for k in index.kanji(level)
+        for jlpt in (level, "None")
+    ]
+
+    async def run() -> tuple[int, int]:
+        # Entering the client sets it up enough to be closed again without
+        # ever having connected.
+        async with NicBot() as bot:
+            return await warm_renders(bot, kanji, workers=args.workers)
+
+    start = time.perf_counter()
+    rendered, failed = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {rendered} embeds in {elapsed:.1f}s ({failed} failed)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m nicbot.assets",
+        description="Build the bot's precompiled data files.",
+    )
+    subparsers = parser.add_subparsers(required=True)
+
+    optimize_strokes = subparsers.add_parser(
+        "optimize-strokes",
+        help=f"Write smaller images to {STROKE_ORDERS_OPTIMIZED_DIR}",
+    )
+    optimize_strokes.add_argument(
+        "--max-width",
+        type=int,
+        default=None,
+        help="Scale images down to at most this wide (requires Pillow)",
+    )
+    optimize_strokes.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: one per CPU core)",
+    )
+    optimize_strokes.set_defaults(func=optimize_stroke_orders)
+
+    pack_strokes = subparsers.add_parser(
+        "pack-strokes",
+        help=f"Pack {STROKE_ORDERS_DIR}/*.png into {STROKE_ORDERS_PACK}",
+    )
+    pack_strokes.add_argument(
+        "-o",
+        "--output",
+        type=pathlib.Path,
+        default=data_path(STROKE_ORDERS_PACK),
+        help="Where to write the pack",
+    )
+    pack_strokes.set_defaults(func=pack_stroke_orders)
+
+    warm = subparsers.add_parser(
+        "warm-kotd",
+        help="Render the Kanji of the Day embeds for the JLPT kanji ahead of "
+        "time (uses jisho.org for kanji that aren't cached yet)",
+    )
+    warm.add_argument(
+        "levels",
+        nargs="*",
+        help="Only render these levels (e.g., N5 N4; default: all)",
+    )
+    warm.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of lookups to run at a time",
+    )
+    warm.set_defaults(func=warm_kotd)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
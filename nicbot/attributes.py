@@ -0,0 +1,244 @@
+"""Filter kanji by stroke count, JLPT level and radical.
+
+Every kanji that has a stroke order image gets a row in a few parallel
+arrays (one per attribute). For each value of an attribute, the rows that
+have it are also kept as a bitset (a Python :class:`int`, one bit per row),
+so a query like "N3 kanji with 8 to 10 strokes" is a handful of ``|`` and
+``&`` operations over ~6,000 bits instead of a scan, let alone a request to
+jisho.org per candidate.
+"""
+
+from __future__ import annotations
+
+import bisect
+import dataclasses
+import random
+from array import array
+from typing import Any, Collection, Iterable, Mapping
+
+from .jlpt import JLPTIndex
+from .kanjidic import KANGXI_RADICALS_START, RADICAL, STROKES
+
+__all__ = (
+    "KanjiAttributeIndex",
+    "KanjiFilter",
+)
+
+KANGXI_RADICALS = 214
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class KanjiFilter:
+    """What to select kanji by; attributes left as ``None`` match
+    anything.
+
+    Parameters
+    ----------
+    levels: :class:`frozenset` [:class:`str`], optional
+        JLPT levels (e.g., ``"N3"``), any of which may match.
+    strokes: :class:`tuple` [:class:`int`, :class:`int`], optional
+        The smallest and largest stroke count to match, inclusive.
+    radicals: :class:`frozenset` [:class:`int`], optional
+        Kangxi radical numbers (1 to 214), any of which may match.
+    """
+
+    levels: frozenset[str] | None = None
+    strokes: tuple[int, int] | None = None
+    radicals: frozenset[int] | None = None
+
+
+class KanjiAttributeIndex:
+    """Selects kanji by their attributes.
+
+    Use :meth:`build` to create one from the JLPT lists and the local
+    kanji index.
+
+    Parameters
+    ----------
+    kanji: :class:`Iterable` [:class:`str`]
+        The kanji to index.
+    levels: :class:`tuple` [:class:`str`, ...]
+        The names of the JLPT levels.
+    level: :class:`Iterable` [:class:`int`]
+        Per kanji, its position in ``levels`` plus one, or 0 for none.
+    strokes: :class:`Iterable` [:class:`int`]
+        Per kanji, its stroke count, or 0 if unknown.
+    radical: :class:`Iterable` [:class:`int`]
+        Per kanji, its Kangxi radical number, or 0 if unknown.
+    """
+
+    def __init__(
+        self,
+        kanji: Iterable[str] = (),
+        levels: tuple[str, ...] = (),
+        level: Iterable[int] = (),
+        strokes: Iterable[int] = (),
+        radical: Iterable[int] = (),
+    ) -> None:
+        self.level_names = levels
+        self.codepoints = array("I", map(ord, kanji))
+        self.level = array("B", level)
+        self.strokes = array("B", strokes)
+        self.radical = array("B", radical)
+
+        self._by_level = self._bitsets(self.level)
+        self._by_strokes = self._bitsets(self.strokes)
+        self._by_radical = self._bitsets(self.radical)
+        self._all = (1 << len(self.codepoints)) - 1
+
+    @staticmethod
+    def _bitsets(values: array[int]) -> list[int]:
+        size = (len(values) + 7) // 8
+        bits = [bytearray(size) for _ in range(max(values, default=0) + 1)]
+
+        for row, value in enumerate(values):
+            bits[value][row >> 3] |= 1 << (row & 7)
+
+        return [int.from_bytes(b, "little") for b in bits]
+
+    @classmethod
+    def build(
+        cls,
+        codepoints: Collection[int],
+        jlpt: JLPTIndex,
+        entries: Mapping[str, list[Any]],
+    ) -> KanjiAttributeIndex:
+        """Index the kanji with the given code points (i.e., the ones with
+        stroke order images), taking their stroke counts and radicals from
+        :attr:`nicbot.kanjidic.KanjiIndex.entries`."""
+        kanji = [chr(c) for c in sorted(codepoints)]
+        positions = {name: i + 1 for i, name in enumerate(jlpt.names)}
+        missing = [0] * (RADICAL + 1)
+
+        return cls(
+            kanji,
+            jlpt.names,
+            (positions.get(jlpt.level(k) or "", 0) for k in kanji),
+            ((entries.get(k) or missing)[STROKES] or 0 for k in kanji),
+            ((entries.get(k) or missing)[RADICAL] or 0 for k in kanji),
+        )
+
+    def __len__(self) -> int:
+        return len(self.codepoints)
+
+    @property
+    def has_details(self) -> bool:
+        """Whether stroke counts and radicals are known (i.e., the local
+        kanji index had been built)."""
+        return any(self.strokes)
+
+    def radical_number(self, text: str, /) -> int | None:
+        """Parse a radical given as its number, as a Kangxi radical
+        character (e.g., ⽔) or as a kanji, meaning that kanji's radical
+        (e.g., 水 or 海 for radical 85). Returns ``None`` if it isn't
+        one."""
+        if text.isdecimal():
+            number = int(text)
+        elif len(text) != 1:
+            return None
+        elif (
+            0
+            <= (offset := ord(text) - KANGXI_RADICALS_START)
+            < KANGXI_RADICALS
+        ):
+            number = offset + 1
+        elif (row := self._row(text)) is not None:
+            number = self.radical[row]
+        else:
+            return None
+
+        if 1 <= number <= KANGXI_RADICALS:
+            return number
+
+        return None
+
+    def _any_of(self, bitsets: list[int], values: Iterable[int]) -> int:
+        mask = 0
+
+        for value in values:
+            if 0 <= value < len(bitsets):
+                mask |= bitsets[value]
+
+        return mask
+
+    def matching(self, query: KanjiFilter, /) -> int:
+        """Return the rows that match as a bitset."""
+        mask = self._all
+
+        if query.levels is not None:
+            positions = {n: i + 1 for i, n in enumerate(self.level_names)}
+            levels = (positions.get(level, -1) for level in query.levels)
+            mask &= self._any_of(self._by_level, levels)
+
+        if query.strokes is not None:
+            # Stroke counts past the largest one match nothing; don't loop
+            # over them.
+            low, high = query.strokes
+            high = min(high, len(self._by_strokes) - 1)
+            strokes = range(max(low, 1), high + 1)
+            mask &= self._any_of(self._by_strokes, strokes)
+
+        if query.radicals is not None:
+            mask &= self._any_of(self._by_radical, query.radicals)
+
+        return mask
+
+    def count(self, query: KanjiFilter, /) -> int:
+        return self.matching(query).bit_count()
+
+    def select(self, query: KanjiFilter, /) -> list[str]:
+        """Return every kanji that matches, in code point order."""
+        mask = self.matching(query)
+        return [chr(self.codepoints[row]) for row in _rows(mask)]
+
+    def choice(
+        self,
+        query: KanjiFilter,
+        /,
+        rng: random.Random | None = None,
+    ) -> str | None:
+        """Pick one kanji that matches at random, or ``None`` if none
+        do."""
+        mask = self.matching(query)
+
+        if not (count := mask.bit_count()):
+            return None
+
+        n = (rng or random).randrange(count)
+        return chr(self.codepoints[_nth_row(mask, n)])
+
+    def _row(self, kanji: str, /) -> int | None:
+        row = bisect.bisect_left(self.codepoints, ord(kanji))
+
+        if row < len(self.codepoints) and self.codepoints[row] == ord(kanji):
+            return row
+
+        return None
+
+
+def _rows(mask: int, /) -> Iterable[int]:
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def _nth_row(mask: int, n: int, /) -> int:
+    """Return the row of the ``n``-th set bit (counting from 0)."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    row = 0
+
+    # Skip whole bytes first, then find the bit within the byte.
+    for byte in data:
+        if (bits := byte.bit_count()) <= n:
+            n -= bits
+            row += 8
+            continue
+
+        for bit in range(8):
+            if byte >> bit & 1:
+                if n == 0:
+                    return row + bit
+                n -= 1
+
+    raise IndexError("mask has fewer set bits than requested")
@@ -1,21 +1,48 @@
+import asyncio
 import logging
 import os
 import pathlib
 import random
+import time
 import tomllib
-from typing import Any
+from typing import Any, Awaitable, Sequence
 
 import discord
 import overrides
 from discord.ext import commands
 
+from .assets import data_path, jlpt_index, stroke_order_codepoints
+from .attributes import KanjiAttributeIndex
+from .cache import LookupCache
+from .dictionary import DictionaryClient, preload
+from .gateway import PROFILES, GatewayProfile, memory_report, required_intents
+from .kanjidic import KanjiIndex
+from .metrics import MetricsServer, counter, histogram
+from .readings import ReadingIndex
+from .sentences import SentenceIndex
+from .utils import hot_reload_extension
+
 _log = logging.getLogger(__name__)
 
+COMMAND_SECONDS = histogram(
+    "nicbot_command_seconds",
+    "Time taken to run a command, including its checks",
+    ("command",),
+)
+COMMAND_ERRORS = counter(
+    "nicbot_command_errors_total",
+    "Commands that raised an error, by the type of error",
+    ("command", "error"),
+)
+
 
 def loadable_cog_extension(filename: str) -> bool:
     return filename.endswith(".py") and not filename.startswith("_")
 
 
+COGS_DIR = pathlib.Path(__file__).parent.joinpath("cogs")
+
+
 def get_pyproject_config() -> dict[str, Any]:
     """Reads the project's `pyproject.toml` and returns the configuration."""
     root = pathlib.Path(__file__).parents[1]
@@ -28,10 +55,22 @@ def get_pyproject_config() -> dict[str, Any]:
     return config
 
 
-class NicBot(commands.Bot):
-    """Represents a bot that runs on Discord"""
+class NicBot(commands.AutoShardedBot):
+    """Represents a bot that runs on Discord
+
+    By default, it connects as a single shard. Pass ``shard_count=None`` to
+    use as many shards as Discord recommends, and ``shard_ids`` to only run
+    some of them in this process (see :mod:`nicbot.shards`).
+    """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        profile: GatewayProfile = PROFILES["minimal"],
+        shard_count: int | None = 1,
+        shard_ids: Sequence[int] | None = None,
+        watch_cogs: bool = False,
+    ) -> None:
         config = get_pyproject_config()
         assert "project" in config.keys(), config.keys()
 
@@ -47,24 +86,193 @@ class NicBot(commands.Bot):
             owner_id=None,
             owner_ids=None,
             strip_after_prefix=True,
-            intents=discord.Intents.all(),
+            shard_count=shard_count,
+            shard_ids=list(shard_ids) if shard_ids is not None else None,
+            **profile.client_options(),
         )
+        self.profile = profile
+
+        # Shared by every cog so HTTP connections to the dictionary are
+        # pooled, the number of requests in flight stays bounded, and
+        # repeat lookups are answered locally whenever possible.
+        self.dictionary = DictionaryClient(
+            cache=LookupCache(),
+            index=KanjiIndex(),
+        )
+        # Finished Kanji of the Day embeds, so showing a kanji again skips
+        # the dictionary and the rendering. `None` disables it.
+        self.renders: LookupCache | None = LookupCache(
+            data_path("renders.sqlite3"), max_entries=4096
+        )
+        # Filled in from the local kanji index during `setup_hook`.
+        self.readings = ReadingIndex()
+        self.kanji_attributes = KanjiAttributeIndex()
+        # Example sentences for `!jisho sentence`, searched locally.
+        self.sentences = SentenceIndex()
+        self.metrics_server = MetricsServer.from_env()
+        # How long each step of `setup_hook` took, in seconds.
+        self.startup_timings: dict[str, float] = {}
+        self._preload: asyncio.Task[None] | None = None
+        # Reload cogs as soon as their source changes (for development).
+        self.watch_cogs = watch_cogs
+        self._watcher: asyncio.Task[None] | None = None
 
     @overrides.override
     async def setup_hook(self) -> None:
-        cogs = pathlib.Path(__file__).parent.joinpath("cogs")
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+            _log.info(
+                "Serving metrics on "
+                f"http://127.0.0.1:{self.metrics_server.port}/metrics"
+            )
 
         # Automatically discover and load extensions onto the bot instance.
-        files = os.listdir(cogs)
+        files = os.listdir(COGS_DIR)
         extensions = filter(loadable_cog_extension, files)
+        names = ["." + e.removesuffix(".py") for e in sorted(extensions)]
+
+        # The extensions don't depend on each other (or on the local kanji
+        # index), so load them all at the same time.
+        start = time.perf_counter()
+        await asyncio.gather(
+            self._timed("kanji index", self._load_indexes()),
+            self._timed(
+                "sentence index", asyncio.to_thread(self.sentences.load)
+            ),
+            *(
+                self._timed(name, self._load_cog_extension(name))
+                for name in names
+            ),
+        )
+        total = (time.perf_counter() - start) * 1000
+
+        report = ", ".join(
+            f"{name} {elapsed * 1000:.1f}ms"
+            for name, elapsed in self.startup_timings.items()
+        )
+        _log.info(f"Set up in {total:.1f}ms ({report})")
+        self._check_intents()
+
+        # The dictionary's parsers are only needed once someone looks
+        # something up; import them in the background instead of holding up
+        # the connection to Discord.
+        self._preload = asyncio.create_task(
+            self._timed("dictionary parsers", asyncio.to_thread(preload))
+        )
+
+        if self.watch_cogs:
+            self._watcher = asyncio.create_task(self._watch_cog_files())
+
+    def _check_intents(self) -> None:
+        needed = required_intents(self.cogs.values())
+        have = self.profile.intents
+
+        if missing := [n for n, on in needed if on and not getattr(have, n)]:
+            _log.error(
+                "The gateway profile is missing intents the cogs need "
+                f"(some of their features won't work): {', '.join(missing)}"
+            )
 
-        for extension in extensions:
-            name = "." + extension.removesuffix(".py")
+        if unused := [n for n, on in have if on and not getattr(needed, n)]:
+            _log.info(
+                "The gateway profile asks for intents no cog needs: "
+                f"{', '.join(unused)}"
+            )
 
+    async def _timed(self, name: str, coroutine: Awaitable[None]) -> None:
+        start = time.perf_counter()
+        await coroutine
+        self.startup_timings[name] = time.perf_counter() - start
+
+    async def _load_indexes(self) -> None:
+        # Read the local kanji index now, off the event loop, rather than
+        # during the first lookup.
+        assert self.dictionary.index is not None
+        await asyncio.to_thread(self.dictionary.index.load)
+        self.readings = await asyncio.to_thread(
+            ReadingIndex.from_entries, self.dictionary.index.entries
+        )
+        self.kanji_attributes = await asyncio.to_thread(
+            self._build_kanji_attributes
+        )
+
+    def _build_kanji_attributes(self) -> KanjiAttributeIndex:
+        assert self.dictionary.index is not None
+        return KanjiAttributeIndex.build(
+            stroke_order_codepoints(),
+            jlpt_index(),
+            self.dictionary.index.entries,
+        )
+
+    async def _load_cog_extension(self, name: str) -> None:
+        try:
+            await self.load_extension(name, package="nicbot.cogs")
+        except Exception as exc:
+            _log.error(f"unable to load extension {name!r}: {exc}")
+
+    async def _watch_cog_files(self, interval: float = 1.0) -> None:
+        # Polling is plenty for a handful of files, and needs no extra
+        # dependency.
+        def scan() -> dict[str, float]:
+            return {
+                "." + p.name.removesuffix(".py"): p.stat().st_mtime
+                for p in COGS_DIR.iterdir()
+                if loadable_cog_extension(p.name)
+            }
+
+        seen = scan()
+        _log.info(f"Watching {COGS_DIR} for changes")
+
+        while True:
+            await asyncio.sleep(interval)
+
+            # Editors that save by replacing the file can make one vanish
+            # between being listed and being looked at; try again later.
             try:
-                await self.load_extension(name, package="nicbot.cogs")
-            except Exception as exc:
-                _log.error(f"unable to load extension {name!r}: {exc}")
+                current = scan()
+            except OSError as exc:
+                _log.warning(f"unable to scan {COGS_DIR}: {exc}")
+                continue
+
+            for name in sorted(seen.keys() | current.keys()):
+                if seen.get(name) == current.get(name):
+                    continue
+
+                try:
+                    if name not in current:
+                        await self.unload_extension(
+                            name, package="nicbot.cogs"
+                        )
+                        action = "Unloaded"
+                    elif f"nicbot.cogs{name}" in self.extensions:
+                        await hot_reload_extension(
+                            self, name, package="nicbot.cogs"
+                        )
+                        action = "Reloaded"
+                    else:
+                        await self.load_extension(name, package="nicbot.cogs")
+                        action = "Loaded"
+                except (commands.ExtensionError, OSError) as exc:
+                    _log.error(f"unable to reload extension {name!r}: {exc}")
+                else:
+                    _log.info(f"{action} extension {name!r}")
+
+            seen = current
+
+    @overrides.override
+    async def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+
+        await self.dictionary.close()
+
+        if self.renders is not None:
+            self.renders.close()
+
+        await super().close()
 
     async def on_ready(self) -> None:
         activities = [
@@ -84,3 +292,47 @@ class NicBot(commands.Bot):
 
         assert self.user is not None
         _log.info(f"Logged in as {self.user.name!r}")
+        _log.info(f"Memory after connecting: {memory_report(self)}")
+
+    @overrides.override
+    async def invoke(self, ctx: "commands.Context[NicBot]", /) -> None:
+        start = time.perf_counter()
+
+        try:
+            await super().invoke(ctx)
+        finally:
+            if ctx.command is not None:
+                name = ctx.command.qualified_name
+                elapsed = time.perf_counter() - start
+                COMMAND_SECONDS.observe(elapsed, command=name)
+                elapsed *= 1000
+                _log.info(
+                    f"Ran command {name!r} in {elapsed:.1f}ms",
+                    extra={
+                        "command": name,
+                        "guild": ctx.guild.id if ctx.guild else None,
+                        "latency": round(elapsed, 3),
+                    },
+                )
+
+    @overrides.override
+    async def on_command_error(
+        self,
+        context: "commands.Context[NicBot]",
+        exception: commands.CommandError,
+        /,
+    ) -> None:
+        if context.command is not None:
+            COMMAND_ERRORS.inc(
+                command=context.command.qualified_name,
+                error=type(exception).__name__,
+            )
+
+        if isinstance(exception, commands.CommandOnCooldown):
+            await context.reply(
+                f"Slow down! Try again in {exception.retry_after:.0f}s.",
+                delete_after=exception.retry_after,
+            )
+            return
+
+        await super().on_command_error(context, exception)
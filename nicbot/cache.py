@@ -0,0 +1,313 @@
+"""Persistent cache for dictionary lookups.
+
+Dictionary entries almost never change, so every response is kept in an
+in-memory LRU backed by a SQLite database in the ``data`` directory. This
+means repeat lookups are answered without a network round trip, even after
+the bot restarts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import dataclasses
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from .assets import data_path
+
+__all__ = (
+    "ByteLRU",
+    "CacheEntry",
+    "CacheStats",
+    "LookupCache",
+    "normalize_query",
+)
+
+_log = logging.getLogger(__name__)
+
+# The cache lives next to the rest of the bot's data files.
+DEFAULT_PATH = data_path("cache.sqlite3")
+
+DAY = 24 * 60 * 60
+
+
+def normalize_query(query: str, /) -> str:
+    """Normalize a query so equivalent inputs share a cache key.
+
+    Full-width ASCII and half-width katakana are folded with NFKC, and
+    surrounding whitespace and letter case are ignored.
+    """
+    return unicodedata.normalize("NFKC", query).strip().lower()
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class CacheEntry:
+    """A cached lookup result.
+
+    A ``value`` of ``None`` records that the dictionary had no results
+    for the query (i.e., negative caching).
+    """
+
+    value: str | None
+    expires: float
+
+    @property
+    def expired(self) -> bool:
+        return self.expires <= time.time()
+
+
+@dataclasses.dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    """Lookups answered from memory."""
+    disk_hits: int = 0
+    """Lookups answered from the database."""
+    negative_hits: int = 0
+    """Hits (from either layer) that recorded "no results"."""
+    misses: int = 0
+    """Lookups that were not in the cache or had expired."""
+    evictions: int = 0
+    """Entries dropped from memory to stay within ``max_entries``."""
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total else 0.0
+
+
+class LookupCache:
+    """An LRU cache in front of a SQLite database.
+
+    Parameters
+    ----------
+    path: :class:`pathlib.Path` | ``None``, optional
+        Where to store the database. Pass ``None`` to only cache in memory.
+    max_entries: :class:`int`, optional
+        The number of entries to keep in memory.
+    max_rows: :class:`int`, optional
+        The number of entries to keep in the database. The least recently
+        stored entries are deleted first.
+    ttl: :class:`float`, optional
+        The number of seconds a result stays valid.
+    negative_ttl: :class:`float`, optional
+        The number of seconds a "no results" answer stays valid. This is
+        shorter than ``ttl`` since new entries do get added to the
+        dictionary from time to time.
+    """
+
+    # Pruning the database requires a full count, so only do it every so
+    # often instead of on every write.
+    PRUNE_INTERVAL = 256
+
+    def __init__(
+        self,
+        path: pathlib.Path | None = DEFAULT_PATH,
+        *,
+        max_entries: int = 1024,
+        max_rows: int = 100_000,
+        ttl: float = 30 * DAY,
+        negative_ttl: float = 1 * DAY,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stats = CacheStats()
+
+        self._memory: collections.OrderedDict[tuple[str, str], CacheEntry] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self.path is None:
+            return None
+
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # The connection is shared with worker threads, so access to it
+            # is serialized through `self._lock` instead. Other processes
+            # (e.g., shards) may be writing too; wait for them a while.
+            self._db = sqlite3.connect(
+                self.path, timeout=10.0, check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS lookups ("
+                "kind TEXT NOT NULL, "
+                "query TEXT NOT NULL, "
+                "value TEXT, "
+                "stored REAL NOT NULL, "
+                "expires REAL NOT NULL, "
+                "PRIMARY KEY (kind, query))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS lookups_stored ON lookups (stored)"
+            )
+
+        return self._db
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _remember(self, key: tuple[str, str], entry: CacheEntry) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _hit(self, entry: CacheEntry) -> CacheEntry:
+        if entry.value is None:
+            self.stats.negative_hits += 1
+        return entry
+
+    async def get(self, kind: str, query: str) -> CacheEntry | None:
+        """Return the cached entry for a lookup, or ``None`` on a miss."""
+        key = (kind, normalize_query(query))
+
+        if (entry := self._memory.get(key)) is not None:
+            if not entry.expired:
+                self._memory.move_to_end(key)
+                self.stats.hits += 1
+                return self._hit(entry)
+
+            del self._memory[key]
+
+        if self.path is not None:
+            try:
+                entry = await asyncio.to_thread(self._load, key)
+            except sqlite3.OperationalError as exc:
+                # E.g., another process held a lock for too long.
+                _log.warning(f"unable to read from the lookup cache: {exc}")
+                entry = None
+
+            if entry is not None and not entry.expired:
+                self._remember(key, entry)
+                self.stats.disk_hits += 1
+                return self._hit(entry)
+
+        self.stats.misses += 1
+        return None
+
+    async def set(self, kind: str, query: str, value: str | None) -> None:
+        """Cache the result of a lookup.
+
+        Pass ``None`` as the value to record that there were no results.
+        """
+        key = (kind, normalize_query(query))
+        ttl = self.ttl if value is not None else self.negative_ttl
+        entry = CacheEntry(value=value, expires=time.time() + ttl)
+        self._remember(key, entry)
+
+        if self.path is not None:
+            try:
+                await asyncio.to_thread(self._store, key, entry)
+            except sqlite3.OperationalError as exc:
+                _log.warning(f"unable to write to the lookup cache: {exc}")
+
+    def _load(self, key: tuple[str, str]) -> CacheEntry | None:
+        with self._lock:
+            db = self._connect()
+            assert db is not None
+            row = db.execute(
+                "SELECT value, expires FROM lookups "
+                "WHERE kind = ? AND query = ?",
+                key,
+            ).fetchone()
+
+        return CacheEntry(*row) if row is not None else None
+
+    def _store(self, key: tuple[str, str], entry: CacheEntry) -> None:
+        with self._lock:
+            db = self._connect()
+            assert db is not None
+
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO lookups "
+                    "(kind, query, value, stored, expires) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (*key, entry.value, time.time(), entry.expires),
+                )
+
+            self._writes += 1
+
+            if self._writes % self.PRUNE_INTERVAL == 0:
+                self._prune(db)
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        with db:
+            db.execute(
+                "DELETE FROM lookups WHERE expires <= ?", (time.time(),)
+            )
+            db.execute(
+                "DELETE FROM lookups WHERE rowid IN ("
+                "SELECT rowid FROM lookups ORDER BY stored DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            )
+
+        _log.debug("Pruned expired and excess rows from the lookup cache")
+
+
+class ByteLRU:
+    """An LRU cache of byte strings, bounded by their combined size.
+
+    Parameters
+    ----------
+    max_bytes: :class:`int`
+        The most bytes to keep. The least recently used values are evicted
+        to make room for new ones; values larger than this are not cached.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: collections.OrderedDict[str, bytes] = (
+            collections.OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str, /) -> bytes | None:
+        if (value := self._items.get(key)) is None:
+            self.misses += 1
+            return None
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes, /) -> None:
+        if len(value) > self.max_bytes:
+            return
+
+        if (previous := self._items.pop(key, None)) is not None:
+            self.size -= len(previous)
+
+        self._items[key] = value
+        self.size += len(value)
+
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
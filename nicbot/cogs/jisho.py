@@ -1,27 +1,52 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Any, Sequence, cast
 
 from discord.ext import commands
-from jisho_api.kanji import Kanji
-from jisho_api.sentence import Sentence
-from jisho_api.word import Word
 
 from ..bot import NicBot
-from ..utils import auto_add_cogs
+from ..dictionary import DictionaryError
+from ..pager import Pager, PagerRegistry
+from ..ratelimit import dictionary_rate_limit
+from ..utils import add_registered_cogs, is_kana, is_kanji, register_cog
 
 if TYPE_CHECKING:
+    from jisho_api.kanji.cfg import KanjiConfig
+    from jisho_api.sentence.cfg import SentenceConfig
+    from jisho_api.word.cfg import WordConfig
+
+    from ..sentences import Example
+
     type Context = commands.Context[NicBot]
 
 _log = logging.getLogger(__name__)
 
+# Each kanji is its own request to jisho.org, so don't let one message
+# look up more than this many.
+KANJI_LIMIT = 20
+SENTENCE_LIMIT = 25
+SENTENCES_PER_PAGE = 5
 
+
+@register_cog
 class Jisho(commands.Cog):
     """Search sentences and definitions from a Japanese dictionary."""
 
     def __init__(self, bot: commands.Bot, /) -> None:
         self.bot = cast(NicBot, bot)
+        self.pagers = PagerRegistry()
+
+    async def cog_unload(self) -> None:
+        await self.pagers.clear()
+
+    def export_state(self) -> dict[str, Any]:
+        # Hand the open pagers over instead of expiring them on unload.
+        pagers, self.pagers = self.pagers, PagerRegistry()
+        return {"pagers": pagers}
+
+    def import_state(self, state: dict[str, Any], /) -> None:
+        self.pagers = state.get("pagers", self.pagers)
 
     @commands.Cog.listener()
     async def on_ready(self) -> None:
@@ -31,92 +56,167 @@ class Jisho(commands.Cog):
     async def jisho(self, ctx: Context, /) -> None:
         return
 
-    # TODO: If query has more than one kanji, search each kanji individually
-    # and return the results in a pager.
-    # TODO: If query is not a kanji, try to convert it into Kanji for the user.
-    # (e.g., try to convert とり into 鳥)
     @jisho.command()
+    @dictionary_rate_limit.check()
     async def kanji(self, ctx: Context, /, query: str) -> None:
-        """Look for a kanji's definition in the Japanese dictionary."""
-        response = Kanji.request(query)
+        """Look for a kanji's definition in the Japanese dictionary.
+
+        If the query contains more than one kanji, each one is looked up
+        and given its own page. If it is written in kana instead, it is
+        converted to the kanji with that reading (e.g., とり into 鳥).
+        At most 20 kanji are looked up per message.
+        """
+        characters = [c for c in dict.fromkeys(query) if is_kanji(c)]
+
+        if not characters and all(is_kana(c) for c in query):
+            characters = self.bot.readings.lookup(query)
+
+        truncated = len(characters) > KANJI_LIMIT
+        characters = characters[:KANJI_LIMIT]
+
+        try:
+            responses = await self.bot.dictionary.kanji_many(
+                characters or [query]
+            )
+        except DictionaryError:
+            e = "error: failed to complete request"
+            _log.error(e, exc_info=True)
+            await ctx.reply(e)
+            return
 
-        if response is None:
+        entries = [r.data for r in responses.values() if r is not None]
+
+        if not entries:
             await ctx.reply("No results found. Did you submit kanji?")
             return
 
-        entry = response.data
-
-        kanji = entry.kanji
-        strokes = entry.strokes
-        main_meanings = ", ".join(entry.main_meanings)
-        readings_kun = ", ".join(entry.main_readings.kun)
-        readings_on = ", ".join(entry.main_readings.on)
+        note = ""
+        if truncated:
+            note = f"\n-# Only the first {KANJI_LIMIT} kanji were looked up."
 
-        message = (
-            f"**Kanji**: {kanji}\n"
-            f"**Strokes**: {strokes}\n"
-            f"**Main Meanings**: {main_meanings}\n"
-            f"**Kun'yomi**: {readings_kun}\n"
-            f"**On'yomi**: {readings_on}\n"
+        pager = Pager(
+            entries,
+            lambda entry: render_kanji(entry) + note,
+            author_id=ctx.author.id,
         )
 
-        await ctx.reply(message)
+        if len(pager) == 1:
+            await ctx.reply(pager.content())
+            return
+
+        message = await ctx.reply(pager.content(), view=pager)
+        await self.pagers.add(pager, message)
 
-    # TODO: Create a pager for the results.
     # TODO: If a query has 2 or more words in it, try to split the result
     # by replacing the previously matched entry with an empty string and repeat
     # until the original query is empty. I feel like this might return
     # too many results, so maybe not...
     @jisho.command()
+    @dictionary_rate_limit.check()
     async def word(self, ctx: Context, /, query: str) -> None:
         """Look up a word in the Japanese dictionary."""
-        response = Word.request(query)
+        try:
+            response = await self.bot.dictionary.word(query)
+        except DictionaryError:
+            e = "error: failed to complete request"
+            _log.error(e, exc_info=True)
+            await ctx.reply(e)
+            return
 
         if response is None:
             await ctx.reply("No results found. Are you making up words? >.>")
             return
 
-        data = response.data
-
         # Each result that is returned will receive its own page.
-        page = 0
-
-        # The total number of results returned by the query.
-        # total_pages = len(data)
-
-        entry = data[page]
-        assert len(entry.japanese) >= 1, entry.japanese
-        _log.debug(entry)
-        word = entry.japanese[0].word
-        reading = entry.japanese[0].reading
-        jlpt = ", ".join([e.replace("jlpt-", "").upper() for e in entry.jlpt])
-        assert len(entry.senses) >= 1, entry.senses
-        parts_of_speech = ", ".join(entry.senses[0].parts_of_speech)
-        english_definitions = ", ".join(entry.senses[0].english_definitions)
-        antonyms = ", ".join(entry.senses[0].antonyms)
-
-        message = (
-            f"**Word**: {word}\n"
-            f"**Reading**: {reading}\n"
-            f"**JLPT**: {jlpt}\n"
-            f"**Parts of Speech**: {parts_of_speech}\n"
-            f"**English Definitions**: {english_definitions}\n"
-            f"**Antonyms**: {antonyms}\n"
-        )
+        pager = Pager(response.data, render_word, author_id=ctx.author.id)
 
-        await ctx.reply(message)
+        if len(pager) == 1:
+            await ctx.reply(pager.content())
+            return
+
+        message = await ctx.reply(pager.content(), view=pager)
+        await self.pagers.add(pager, message)
 
-    # TODO: Finish implementing this...
     @jisho.command()
+    @dictionary_rate_limit.check()
     async def sentence(self, ctx: Context, /, query: str) -> None:
-        """Look up a sentence in the Japanese dictionary."""
-        response = Sentence.request(query)
-        print("Response:", response)
-        print(type(response))
-        print("Data:", response.data)
-        print(type(response.data))
+        """Find example sentences that use a word or kanji.
+
+        Sentences come from the local index when it has any; otherwise,
+        they are looked up on jisho.org.
+        """
+        examples: Sequence[Example | SentenceConfig]
+        examples = self.bot.sentences.search(query, limit=SENTENCE_LIMIT)
+
+        if not examples:
+            try:
+                response = await self.bot.dictionary.sentence(query)
+            except DictionaryError:
+                e = "error: failed to complete request"
+                _log.error(e, exc_info=True)
+                await ctx.reply(e)
+                return
+
+            examples = response.data[:SENTENCE_LIMIT] if response else []
+
+        if not examples:
+            await ctx.reply("No example sentences found.")
+            return
+
+        pages = [
+            examples[i : i + SENTENCES_PER_PAGE]
+            for i in range(0, len(examples), SENTENCES_PER_PAGE)
+        ]
+        pager = Pager(pages, render_sentences, author_id=ctx.author.id)
+
+        if len(pager) == 1:
+            await ctx.reply(pager.content())
+            return
+
+        message = await ctx.reply(pager.content(), view=pager)
+        await self.pagers.add(pager, message)
+
+
+def render_kanji(entry: KanjiConfig) -> str:
+    kanji = entry.kanji
+    strokes = entry.strokes
+    main_meanings = ", ".join(entry.main_meanings)
+    readings_kun = ", ".join(entry.main_readings.kun or [])
+    readings_on = ", ".join(entry.main_readings.on or [])
+
+    return (
+        f"**Kanji**: {kanji}\n"
+        f"**Strokes**: {strokes}\n"
+        f"**Main Meanings**: {main_meanings}\n"
+        f"**Kun'yomi**: {readings_kun}\n"
+        f"**On'yomi**: {readings_on}\n"
+    )
+
+
+def render_sentences(page: Sequence[Example | SentenceConfig]) -> str:
+    return "\n\n".join(f"{e.japanese}\n> {e.en_translation}" for e in page)
+
+
+def render_word(entry: WordConfig) -> str:
+    assert len(entry.japanese) >= 1, entry.japanese
+    word = entry.japanese[0].word
+    reading = entry.japanese[0].reading
+    jlpt = ", ".join([e.replace("jlpt-", "").upper() for e in entry.jlpt])
+    assert len(entry.senses) >= 1, entry.senses
+    parts_of_speech = ", ".join(entry.senses[0].parts_of_speech)
+    english_definitions = ", ".join(entry.senses[0].english_definitions)
+    antonyms = ", ".join(entry.senses[0].antonyms)
+
+    return (
+        f"**Word**: {word}\n"
+        f"**Reading**: {reading}\n"
+        f"**JLPT**: {jlpt}\n"
+        f"**Parts of Speech**: {parts_of_speech}\n"
+        f"**English Definitions**: {english_definitions}\n"
+        f"**Antonyms**: {antonyms}\n"
+    )
 
 
 # Required at the end of all extension modules.
 async def setup(bot: commands.Bot, /) -> None:
-    await auto_add_cogs(bot)
+    await add_registered_cogs(bot, __name__)
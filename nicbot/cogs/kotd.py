@@ -1,131 +1,546 @@
 from __future__ import annotations
 
+import asyncio
+import dataclasses
+import datetime as dt
+import hashlib
 import json
 import logging
+import os
 import pathlib
 import random
-from typing import Literal, cast
+import time
+from typing import TYPE_CHECKING, Any, Iterable, Literal, Sequence, cast
 
 import discord
-from discord.ext import commands
-from jisho_api.kanji import Kanji
-
+from discord.ext import commands, tasks
+
+from ..assets import (
+    STROKE_ORDERS_DIR,
+    STROKE_ORDERS_OPTIMIZED_DIR,
+    data_path,
+    jlpt_index,
+    stroke_order_pack,
+)
+from ..attributes import KanjiAttributeIndex, KanjiFilter
 from ..bot import NicBot
-from ..utils import auto_add_cogs
+from ..cache import ByteLRU
+from ..dictionary import DictionaryError
+from ..metrics import histogram
+from ..pack import BufferReader
+from ..ratelimit import dictionary_rate_limit
+from ..utils import add_registered_cogs, is_kanji, register_cog
+
+if TYPE_CHECKING:
+    from jisho_api.kanji.cfg import KanjiConfig
+
+    from ..jlpt import JLPTIndex
 
 _log = logging.getLogger(__name__)
 
-file = pathlib.Path.cwd().resolve().joinpath("data", "kanji.json")
-with open(file, "r") as f:
-    KANJI = json.load(f)
+# The kind of entry finished embeds are stored as in `NicBot.renders`. Bump
+# the version whenever `build_embed` changes, so old renders are ignored.
+RENDER_KIND = "kotd-v2"
+
+STROKE_ORDER_SECONDS = histogram(
+    "nicbot_stroke_order_read_seconds",
+    "Time taken to get a stroke order image, by where it was found",
+    ("source",),
+)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Schedule:
+    """When and where to post the Kanji of the Day automatically.
+
+    This is configured through environment variables (e.g., in `.env`):
+
+    - ``KOTD_CHANNEL_IDS``: Comma-separated IDs of the channels to post to.
+      Leave unset to disable scheduled posts.
+    - ``KOTD_POST_TIME``: The time of day to post, in UTC (default: 09:00).
+    - ``KOTD_PREFETCH_HOURS``: How many hours before posting to look up the
+      day's kanji (default: 3).
+    """
+
+    channel_ids: tuple[int, ...]
+    post_time: dt.time
+    prefetch_hours: float
+
+    @classmethod
+    def from_env(cls) -> Schedule | None:
+        channel_ids = os.getenv("KOTD_CHANNEL_IDS", "")
+
+        if not channel_ids.strip():
+            return None
 
-JLPT_VALID_VALUES = tuple(KANJI.keys())
+        post_time = dt.time.fromisoformat(os.getenv("KOTD_POST_TIME", "09:00"))
+
+        return cls(
+            channel_ids=tuple(int(c) for c in channel_ids.split(",") if c),
+            post_time=post_time.replace(tzinfo=dt.UTC),
+            prefetch_hours=float(os.getenv("KOTD_PREFETCH_HOURS", "3")),
+        )
+
+    @property
+    def prefetch_time(self) -> dt.time:
+        post = dt.datetime.combine(dt.date.today(), self.post_time)
+        prefetch = post - dt.timedelta(hours=self.prefetch_hours)
+        return prefetch.timetz()
+
+    def next_post_date(self, now: dt.datetime, /) -> dt.date:
+        """Return the date of the first post at or after ``now``."""
+        post = dt.datetime.combine(now.date(), self.post_time)
+        return post.date() if now <= post else post.date() + dt.timedelta(1)
+
+
+def parse_filter(
+    args: Sequence[str],
+    index: JLPTIndex,
+    attributes: KanjiAttributeIndex,
+) -> KanjiFilter:
+    """Parse the arguments of ``!kotd`` into a filter.
+
+    Raises :exc:`ValueError` for an argument that isn't a JLPT level, a
+    stroke count (or range) or a radical.
+    """
+    levels: set[str] = set()
+    radicals: set[int] = set()
+    strokes: tuple[int, int] | None = None
+
+    for arg in args:
+        key, _, value = arg.partition(":")
+        low, _, high = arg.partition("-")
+
+        if arg.upper() in index.names:
+            levels.add(arg.upper())
+        elif low.isdecimal() and (not high or high.isdecimal()):
+            strokes = (int(low), int(high or low))
+            if strokes[0] > strokes[1]:
+                raise ValueError(f"Invalid stroke count range {arg!r}")
+        elif key.lower() in ("radical", "r") and value:
+            if (number := attributes.radical_number(value)) is None:
+                if not attributes.has_details:
+                    raise ValueError(
+                        f"Unknown radical {value!r}: finding a kanji's"
+                        " radical needs the local kanji index (see the"
+                        " README)"
+                    )
+                raise ValueError(f"Unknown radical {value!r}")
+            radicals.add(number)
+        else:
+            raise ValueError(f"Unknown filter {arg!r}")
+
+    return KanjiFilter(
+        levels=frozenset(levels) or None,
+        strokes=strokes,
+        radicals=frozenset(radicals) or None,
+    )
 
 
+def pick_daily_kanji(index: JLPTIndex, day: dt.date, channel_id: int) -> str:
+    """Pick the Kanji of the Day for a channel.
+
+    The choice only depends on its arguments (it does not use :mod:`random`
+    or :func:`hash`, which differ between processes), so it is the same no
+    matter when it is computed or how often the bot restarts.
+    """
+    pool = [kanji for level in index.names for kanji in index.kanji(level)]
+    seed = hashlib.sha256(f"{day.isoformat()}:{channel_id}".encode())
+    return pool[int.from_bytes(seed.digest()[:8]) % len(pool)]
+
+
+@register_cog
 class KanjiOfTheDay(commands.Cog):
     """Command for sending the Kanji of the day to the Sunflower Field."""
 
+    # Scheduled posts look their channels up in the guild cache.
+    required_intents = discord.Intents(guilds=True)
+
     def __init__(self, bot: commands.Bot, /) -> None:
         self.bot = cast(NicBot, bot)
+        # Recently sent stroke order images, for when they aren't packed.
+        self.images = ByteLRU(max_bytes=16 * 1024 * 1024)
+
+        self.schedule = Schedule.from_env()
+        # The embeds for upcoming scheduled posts, keyed by channel ID.
+        self.prepared: dict[int, tuple[dt.date, str, discord.Embed]] = {}
+
+    async def cog_load(self) -> None:
+        if self.schedule is None:
+            return
+
+        self.prefetch_daily.change_interval(time=self.schedule.prefetch_time)
+        self.post_daily.change_interval(time=self.schedule.post_time)
+        self.prefetch_daily.start()
+        self.post_daily.start()
+
+    async def cog_unload(self) -> None:
+        self.prefetch_daily.cancel()
+        self.post_daily.cancel()
+
+    def export_state(self) -> dict[str, Any]:
+        return {"images": self.images, "prepared": self.prepared}
+
+    def import_state(self, state: dict[str, Any], /) -> None:
+        self.images = state.get("images", self.images)
+        self.prepared = state.get("prepared", self.prepared)
 
     @commands.Cog.listener()
     async def on_ready(self) -> None:
         _log.info(f"Loaded cog {self.__class__.__name__!r}")
 
     @commands.command()
-    async def kotd(
-        self,
-        ctx: commands.Context[NicBot],
-        /,
-        kanji_or_jlpt: str = random.choice(JLPT_VALID_VALUES),
-    ) -> None:
+    @dictionary_rate_limit.check()
+    async def kotd(self, ctx: commands.Context[NicBot], /, *args: str) -> None:
+        """Show a kanji, or one picked at random.
+
+        Pick from a JLPT level (``N5`` to ``N1``), a stroke count or range
+        (``8`` or ``8-10``) and a radical (``radical:水``, or any kanji to
+        use its radical), in any combination: e.g., ``!kotd N3 8-10``.
+        """
         jlpt: Literal["N1", "N2", "N3", "N4", "N5", "None"]
 
-        kanji_or_jlpt = kanji_or_jlpt.upper()
+        # The kanji lists are loaded on first use and kept across reloads.
+        index = jlpt_index()
+        attributes = self.bot.kanji_attributes
 
-        if kanji_or_jlpt in JLPT_VALID_VALUES:
-            jlpt = kanji_or_jlpt
-            kanji = random.choice(KANJI[jlpt])
-        else:
+        try:
+            query = parse_filter(args, index, attributes)
+        except ValueError as exc:
+            # A single kanji isn't a filter; it's the kanji to look up.
+            if len(args) != 1 or not is_single_kanji(args[0]):
+                await ctx.reply(f"{exc}. Try e.g. `!kotd N3 8-10`.")
+                return
+
+            query = None
+
+        if query is None:
+            # Not a filter, so it must be the kanji to look up.
             jlpt = "None"
-            kanji = kanji_or_jlpt
+            kanji = args[0]
+        elif query.strokes is None and query.radicals is None:
+            # Pick a level at random for every invocation that doesn't ask
+            # for one, rather than once when the command is defined.
+            levels = sorted(query.levels or index.names)
+            jlpt = random.choice(levels)
+            kanji = random.choice(index.kanji(jlpt))
+        elif (choice := attributes.choice(query)) is not None:
+            jlpt = index.level(choice) or "None"
+            kanji = choice
+        else:
+            message = "No kanji match those filters."
+            if not attributes.has_details:
+                message += (
+                    " Stroke counts and radicals need the local kanji index"
+                    " (see the README)."
+                )
+            await ctx.reply(message)
+            return
 
         try:
-            response = Kanji.request(kanji=kanji)
-        except Exception:
+            result = await self.lookup(kanji, jlpt)
+        except DictionaryError:
             e = "error: failed to complete request"
             _log.error(e, exc_info=True)
             await ctx.reply(e)
             return
 
+        if result is None:
+            await ctx.reply("No results found. Did you submit kanji?")
+            return
+
+        kanji, embed = result
+        file = await self.get_stroke_order_file(kanji=kanji)
+
+        await ctx.reply(embed=embed, file=file)
+
+    async def lookup(
+        self,
+        kanji: str,
+        jlpt: str = "None",
+    ) -> tuple[str, discord.Embed] | None:
+        """Look up a kanji and build its Kanji of the Day embed.
+
+        Returns the kanji as written in the dictionary along with the embed,
+        or ``None`` if the kanji could not be found.
+
+        Embeds are the same every time for the same arguments, so they are
+        kept in :attr:`NicBot.renders`; a repeat lookup skips the
+        dictionary and the rendering.
+        """
+        renders = self.bot.renders
+        key = f"{kanji}:{jlpt}"
+
+        if renders is not None:
+            rendered = await renders.get(RENDER_KIND, key)
+
+            if rendered is not None and rendered.value is not None:
+                payload = json.loads(rendered.value)
+                if is_single_kanji(payload["kanji"]):
+                    return payload["kanji"], discord.Embed.from_dict(
+                        payload["embed"]
+                    )
+
+        response = await self.bot.dictionary.kanji(kanji)
+
+        if response is None:
+            return None
+
         entry = response.data
 
         # The entry's kanji is returned with a newline at the end.
         kanji = entry.kanji.strip()
 
+        # An entry for anything else (e.g., a whole word) has no stroke
+        # order image to go with it.
+        if not is_single_kanji(kanji):
+            return None
+
         if jlpt == "None":
             if entry.meta.education.jlpt is not None:
                 jlpt = entry.meta.education.jlpt
             else:
-                for key, value in KANJI.items():
-                    if kanji in value:
-                        jlpt = key
-                        break
-                    else:
-                        pass
-                else:
-                    jlpt = "None"
-
-        kunyomi_reading = convert_readings_to_str(entry.main_readings.kun)
-        onyomi_reading = convert_readings_to_str(entry.main_readings.on)
-        main_meanings = ", ".join(entry.main_meanings)
-
-        # Limit the number of examples to use.
-        examples_kun = (
-            entry.reading_examples.kun[0:3]
-            if entry.reading_examples.kun is not None
-            else []
+                jlpt = jlpt_index().level(kanji) or "None"
+
+        embed = build_embed(kanji, entry, jlpt)
+
+        # Entries from the local index have no example vocabulary; don't
+        # keep their embeds, so the full entry is rendered once it's cached.
+        if renders is not None and entry.reading_examples is not None:
+            # The stroke order image is found by the kanji, so that's all
+            # that is needed to send it along with the embed.
+            payload = {"kanji": kanji, "embed": embed.to_dict()}
+            await renders.set(
+                RENDER_KIND, key, json.dumps(payload, ensure_ascii=False)
+            )
+
+        return kanji, embed
+
+    async def prepare_daily(
+        self,
+        channel_id: int,
+        day: dt.date,
+    ) -> tuple[str, discord.Embed] | None:
+        """Look up a channel's Kanji of the Day ahead of time, so posting
+        it doesn't have to wait on the dictionary or the disk."""
+        prepared = self.prepared.get(channel_id)
+
+        if prepared is not None and prepared[0] == day:
+            return prepared[1], prepared[2]
+
+        kanji = pick_daily_kanji(jlpt_index(), day, channel_id)
+
+        try:
+            result = await self.lookup(kanji)
+        except DictionaryError:
+            _log.error(f"unable to prepare kanji {kanji!r}", exc_info=True)
+            return None
+
+        if result is None:
+            _log.error(f"no dictionary entry for scheduled kanji {kanji!r}")
+            return None
+
+        kanji, embed = result
+
+        # Pull the image into memory as well.
+        await self.get_stroke_order_file(kanji=kanji)
+
+        self.prepared[channel_id] = (day, kanji, embed)
+        _log.info(f"Prepared {kanji!r} for channel {channel_id} on {day}")
+        return result
+
+    @tasks.loop(time=dt.time(tzinfo=dt.UTC))
+    async def prefetch_daily(self) -> None:
+        assert self.schedule is not None
+        day = self.schedule.next_post_date(dt.datetime.now(dt.UTC))
+
+        for channel_id in self.schedule.channel_ids:
+            if self.is_elsewhere(channel_id):
+                continue
+
+            await self.prepare_daily(channel_id, day)
+
+    @prefetch_daily.before_loop
+    async def before_prefetch_daily(self) -> None:
+        await self.bot.wait_until_ready()
+        # Also prepare right away, in case the bot (re)started after today's
+        # prefetch time had already passed.
+        await self.prefetch_daily()
+
+    @tasks.loop(time=dt.time(tzinfo=dt.UTC))
+    async def post_daily(self) -> None:
+        assert self.schedule is not None
+        day = dt.datetime.now(dt.UTC).date()
+
+        for channel_id in self.schedule.channel_ids:
+            if self.is_elsewhere(channel_id):
+                continue
+
+            channel = self.bot.get_channel(channel_id)
+
+            if not isinstance(channel, discord.abc.Messageable):
+                _log.warning(f"unable to post to channel {channel_id}")
+                continue
+
+            # Normally a no-op, unless prefetching failed or was skipped.
+            if (prepared := await self.prepare_daily(channel_id, day)) is None:
+                continue
+
+            kanji, embed = prepared
+            file = await self.get_stroke_order_file(kanji=kanji)
+
+            try:
+                await channel.send(embed=embed, file=file)
+            except discord.HTTPException:
+                _log.error(
+                    f"unable to post to channel {channel_id}", exc_info=True
+                )
+
+        # Forget the posts that were just sent.
+        self.prepared = {k: v for k, v in self.prepared.items() if v[0] > day}
+
+    def is_elsewhere(self, channel_id: int, /) -> bool:
+        """Whether a channel's guild is on a shard run by another process,
+        which posts to it instead."""
+        return (
+            self.bot.shard_ids is not None
+            and self.bot.get_channel(channel_id) is None
         )
-        examples_on = entry.reading_examples.on[0:3]
 
-        def convert_to_vocabulary(e: object) -> str:
-            return (
-                f"- **{e.kanji}** ({e.reading}): {"; ".join(e.meanings[0:2])}"
-            )
+    @post_daily.before_loop
+    async def before_post_daily(self) -> None:
+        await self.bot.wait_until_ready()
+
+    async def get_stroke_order_file(self, kanji: str) -> discord.File:
+        kanji_hex = convert_kanji_to_hex(kanji=kanji).removeprefix("0x")
 
-        vocabulary = list(map(convert_to_vocabulary, examples_kun))
-        vocabulary += list(map(convert_to_vocabulary, examples_on))
+        # Serve the image straight out of the memory-mapped pack if it has
+        # been built, instead of opening a file for every request.
+        start = time.perf_counter()
 
-        # The number of lines it takes to write this kanji.
-        strokes = entry.strokes
+        if (pack := stroke_order_pack()) is not None:
+            if (buffer := pack.get(kanji_hex)) is not None:
+                file = discord.File(BufferReader(buffer), filename="kanji.png")
+                elapsed = time.perf_counter() - start
+                STROKE_ORDER_SECONDS.observe(elapsed, source="pack")
+                return file
 
-        embed = discord.Embed(
-            title=f"Kanji of the Day: {kanji}",
-            description=(
-                "Try writing the kanji yourself!\n"
-                "And don't forget to share it with us ৻(  •̀ ᗜ •́  ৻)",
-            ),
-            color=0xBC002D,
+        if (data := self.images.get(kanji_hex)) is not None:
+            source = "memory"
+        else:
+            source = "disk"
+            filepath = get_kanji_stroke_order_filepath(kanji=kanji)
+            data = await asyncio.to_thread(filepath.read_bytes)
+            self.images.put(kanji_hex, data)
+
+        STROKE_ORDER_SECONDS.observe(
+            time.perf_counter() - start, source=source
+        )
+
+        return discord.File(
+            BufferReader(memoryview(data)), filename="kanji.png"
         )
-        embed.add_field(name="Meaning", value=main_meanings, inline=False)
-        embed.add_field(name="Kun'yomi", value=kunyomi_reading, inline=True)
-        embed.add_field(name="On'yomi", value=onyomi_reading, inline=True)
+
+
+async def warm_renders(
+    bot: NicBot,
+    kanji: Iterable[tuple[str, str]],
+    *,
+    workers: int = 8,
+) -> tuple[int, int]:
+    """Render Kanji of the Day embeds ahead of time, into ``bot.renders``.
+
+    ``kanji`` holds the ``(kanji, jlpt)`` pairs to pass to
+    :meth:`KanjiOfTheDay.lookup`. Their full entries are fetched first,
+    even if the local kanji index has them, so the embeds include example
+    vocabulary. ``workers`` lookups run at a time, though
+    requests to jisho.org are still paced by the dictionary client.
+
+    Returns how many were rendered and how many failed.
+    """
+    cog = KanjiOfTheDay(bot)
+    queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue()
+    rendered = failed = 0
+
+    for item in kanji:
+        queue.put_nowait(item)
+
+    async def worker() -> None:
+        nonlocal rendered, failed
+
+        while not queue.empty():
+            kanji, jlpt = queue.get_nowait()
+
+            try:
+                # Fetch the full entry (with example vocabulary) rather
+                # than rendering the local index's.
+                await bot.dictionary.kanji(kanji, local=False)
+                result = await cog.lookup(kanji, jlpt)
+            except DictionaryError:
+                _log.warning(f"unable to render {kanji!r}", exc_info=True)
+                result = None
+
+            if result is None:
+                failed += 1
+            else:
+                rendered += 1
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return rendered, failed
+
+
+def build_embed(kanji: str, entry: KanjiConfig, jlpt: str) -> discord.Embed:
+    kunyomi_reading = convert_readings_to_str(entry.main_readings.kun)
+    onyomi_reading = convert_readings_to_str(entry.main_readings.on)
+    main_meanings = ", ".join(entry.main_meanings)
+
+    # Limit the number of examples to use. Entries from the local kanji
+    # index do not have any examples.
+    examples = entry.reading_examples
+    examples_kun = (
+        examples.kun[0:3]
+        if examples is not None and examples.kun is not None
+        else []
+    )
+    examples_on = (
+        examples.on[0:3]
+        if examples is not None and examples.on is not None
+        else []
+    )
+
+    def convert_to_vocabulary(e: object) -> str:
+        return f"- **{e.kanji}** ({e.reading}): {"; ".join(e.meanings[0:2])}"
+
+    vocabulary = list(map(convert_to_vocabulary, examples_kun))
+    vocabulary += list(map(convert_to_vocabulary, examples_on))
+
+    # The number of lines it takes to write this kanji.
+    strokes = entry.strokes
+
+    embed = discord.Embed(
+        title=f"Kanji of the Day: {kanji}",
+        description=(
+            "Try writing the kanji yourself!\n"
+            "And don't forget to share it with us ৻(  •̀ ᗜ •́  ৻)"
+        ),
+        color=0xBC002D,
+    )
+    embed.add_field(name="Meaning", value=main_meanings, inline=False)
+    embed.add_field(name="Kun'yomi", value=kunyomi_reading, inline=True)
+    embed.add_field(name="On'yomi", value=onyomi_reading, inline=True)
+
+    if vocabulary:
         embed.add_field(
             name="Vocabulary",
             value="\n".join(vocabulary),
             inline=False,
         )
-        embed.add_field(name="JLPT", value=jlpt, inline=True)
-        embed.add_field(name="Strokes", value=strokes, inline=True)
-
-        filepath = get_kanji_stroke_order_filepath(kanji=kanji)
 
-        with open(filepath, "rb") as f:
-            file = discord.File(f, filename="kanji.png")
+    embed.add_field(name="JLPT", value=jlpt, inline=True)
+    embed.add_field(name="Strokes", value=strokes, inline=True)
+    embed.set_image(url="attachment://kanji.png")
 
-        embed.set_image(url="attachment://kanji.png")
-
-        await ctx.reply(embed=embed, file=file)
+    return embed
 
 
 def convert_readings_to_str(readings: list[str] | None) -> str:
@@ -142,6 +557,10 @@ def is_valid_kanji_unicode(value: int, /) -> bool:
     )
 
 
+def is_single_kanji(text: str, /) -> bool:
+    return len(text) == 1 and is_kanji(text)
+
+
 def convert_kanji_to_hex(kanji: str) -> str:
     assert len(kanji) == 1
     kanji_unicode = ord(kanji)
@@ -149,13 +568,20 @@ def convert_kanji_to_hex(kanji: str) -> str:
     return hex(kanji_unicode)
 
 
-def get_kanji_stroke_order_filepath(kanji: str) -> discord.File:
-    root = pathlib.Path(__file__).resolve().parents[2]
+def get_kanji_stroke_order_filepath(kanji: str) -> pathlib.Path:
     kanji_hex = convert_kanji_to_hex(kanji=kanji).removeprefix("0x")
-    filepath = root.joinpath("data", "stroke_orders", f"{kanji_hex}.png")
+    filename = f"{kanji_hex}.png"
+
+    # Prefer the smaller copy made by `python -m nicbot.assets
+    # optimize-strokes`, if there is one.
+    filepath = data_path(STROKE_ORDERS_OPTIMIZED_DIR, filename)
+
+    if not filepath.exists():
+        filepath = data_path(STROKE_ORDERS_DIR, filename)
+
     return filepath
 
 
 # Required at the end of all extension modules.
 async def setup(bot: commands.Bot, /) -> None:
-    await auto_add_cogs(bot)
+    await add_registered_cogs(bot, __name__)
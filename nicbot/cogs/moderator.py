@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import TYPE_CHECKING, cast
 
 from discord.ext import commands
 
 from ..bot import NicBot
-from ..utils import auto_add_cogs
+from ..gateway import memory_report
+from ..metrics import REGISTRY, Histogram, Registry
+from ..utils import add_registered_cogs, hot_reload_extension, register_cog
 
 if TYPE_CHECKING:
     ...
@@ -14,6 +17,7 @@ if TYPE_CHECKING:
 _log = logging.getLogger(__name__)
 
 
+@register_cog
 class Moderator(commands.Cog):
     def __init__(self, bot: commands.Bot, /) -> None:
         self.bot = cast(NicBot, bot)
@@ -37,14 +41,60 @@ class Moderator(commands.Cog):
     @commands.is_owner()
     @commands.command()
     async def reload(self, ctx: commands.Context[NicBot], name: str) -> None:
-        name_raw = name
-        name = f".{name}"
+        """Swap an extension for its latest version, keeping its state."""
+        start = time.perf_counter()
+        await hot_reload_extension(self.bot, f".{name}", package="nicbot.cogs")
+        elapsed = (time.perf_counter() - start) * 1000
+        await ctx.reply(
+            f"Successfully reloaded extension {name!r} in {elapsed:.1f}ms"
+        )
 
-        await self.bot.unload_extension(name=name, package="nicbot.cogs")
-        await self.bot.load_extension(name=name, package="nicbot.cogs")
-        await ctx.reply(f"Successfully reloaded extension {name_raw!r}")
+    @commands.is_owner()
+    @commands.command()
+    async def stats(self, ctx: commands.Context[NicBot]) -> None:
+        """Show how long commands and lookups have been taking."""
+        text = render_stats(REGISTRY)
+
+        if (cache := self.bot.dictionary.cache) is not None:
+            text += (
+                f"\nlookup cache: {cache.stats.hit_ratio:.1%} hit ratio "
+                f"({cache.stats.hits} memory, {cache.stats.disk_hits} disk, "
+                f"{cache.stats.misses} misses)"
+            )
+
+        text += f"\nmemory: {memory_report(self.bot)}"
+        await ctx.reply(f"```\n{text}\n```")
+
+
+def render_stats(registry: Registry) -> str:
+    """Summarize every histogram as a table of percentiles, in ms."""
+    sections = []
+
+    for metric in registry:
+        if not isinstance(metric, Histogram) or not metric.series():
+            continue
+
+        rows = [
+            f"{metric.name.removeprefix('nicbot_')}",
+            f"{'':<20} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8}",
+        ]
+
+        for values in metric.series():
+            labels = dict(zip(metric.label_names, values))
+            name = "/".join(values) or "-"
+            p50, p95, p99 = (
+                metric.quantile(q, **labels) * 1000 for q in (0.5, 0.95, 0.99)
+            )
+            rows.append(
+                f"{name[:20]:<20} {metric.count(**labels):>7} "
+                f"{p50:>8.1f} {p95:>8.1f} {p99:>8.1f}"
+            )
+
+        sections.append("\n".join(rows))
+
+    return "\n\n".join(sections) or "Nothing has been recorded yet."
 
 
 # Required at the end of all extension modules.
 async def setup(bot: commands.Bot, /) -> None:
-    await auto_add_cogs(bot)
+    await add_registered_cogs(bot, __name__)
@@ -0,0 +1,364 @@
+"""Asynchronous client for the jisho.org dictionary.
+
+The :mod:`jisho_api` package only ships blocking ``requests``-based helpers,
+which stall the event loop for the full HTTP round trip when they are called
+from a command. This module performs the HTTP requests with :mod:`aiohttp`
+(already a dependency of discord.py) and reuses :mod:`jisho_api`'s scrapers
+and models to parse the responses, so the cogs receive the same objects
+they did before.
+
+:mod:`jisho_api` (and the ``pydantic``, ``requests`` and ``rich`` packages
+it pulls in) takes hundreds of milliseconds to import, so it is imported on
+first use rather than when the bot starts. Call :func:`preload` to import it
+ahead of time, off the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import urllib.parse
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable
+
+import aiohttp
+
+from .cache import LookupCache, normalize_query
+from .kanjidic import KanjiIndex
+from .metrics import counter, histogram
+from .ratelimit import SingleFlight, TokenBucket
+
+if TYPE_CHECKING:
+    from jisho_api.kanji.request import KanjiRequest
+    from jisho_api.sentence.request import SentenceRequest
+    from jisho_api.word.request import WordRequest
+    from pydantic import BaseModel
+
+__all__ = (
+    "DictionaryClient",
+    "DictionaryError",
+    "preload",
+)
+
+_log = logging.getLogger(__name__)
+
+JISHO_URL = "https://jisho.org"
+
+REQUEST_SECONDS = histogram(
+    "nicbot_dictionary_request_seconds",
+    "Time taken by requests to the dictionary, including waiting for a turn",
+    ("kind",),
+)
+REQUEST_ERRORS = counter(
+    "nicbot_dictionary_request_errors_total",
+    "Requests to the dictionary that failed",
+    ("kind",),
+)
+
+
+def preload() -> None:
+    """Import the modules used to parse responses.
+
+    This blocks while they are imported, so run it in a thread.
+    """
+    import bs4  # noqa: F401
+    import jisho_api.kanji  # noqa: F401
+    import jisho_api.sentence  # noqa: F401
+    import jisho_api.word.request  # noqa: F401
+
+
+class DictionaryError(Exception):
+    """Raised when the dictionary could not be reached or answered with
+    an unexpected status code."""
+
+
+class DictionaryClient:
+    """Looks up kanji, words and sentences on jisho.org without blocking
+    the event loop.
+
+    A single :class:`aiohttp.ClientSession` is shared by every request so
+    connections are pooled and reused. The number of requests in flight
+    at any time is bounded, requests are paced so bursts of commands don't
+    get the bot throttled, and each request is given a timeout. Concurrent
+    lookups of the same query share a single request.
+
+    Parameters
+    ----------
+    base_url: :class:`str`, optional
+        The root URL of the dictionary. Point this at a
+        :class:`nicbot.stub.StubJishoServer` to work offline.
+    timeout: :class:`float`, optional
+        The maximum number of seconds to wait for a single request.
+    max_concurrency: :class:`int`, optional
+        The maximum number of requests allowed in flight at the same time.
+        Extra requests wait for a free slot.
+    requests_per_second: :class:`float` | ``None``, optional
+        The average number of requests to send per second. Requests beyond
+        that wait their turn. Pass ``None`` to disable pacing.
+    cache: :class:`nicbot.cache.LookupCache` | ``None``, optional
+        Where to remember responses (including "no results") so repeat
+        lookups skip the network. The cache is closed with the client.
+    index: :class:`nicbot.kanjidic.KanjiIndex` | ``None``, optional
+        A local kanji dictionary to consult before the network (but after
+        the cache; see :meth:`kanji`).
+    """
+
+    def __init__(
+        self,
+        *,
+        base_url: str = JISHO_URL,
+        timeout: float = 10.0,
+        max_concurrency: int = 4,
+        requests_per_second: float | None = 4.0,
+        cache: LookupCache | None = None,
+        index: KanjiIndex | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.index = index
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = (
+            TokenBucket(requests_per_second)
+            if requests_per_second is not None
+            else None
+        )
+        self._in_flight: SingleFlight[tuple[str, str], Any] = SingleFlight()
+        self._session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self) -> DictionaryClient:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared HTTP session, created on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+            )
+
+        return self._session
+
+    async def close(self) -> None:
+        """Close the underlying HTTP session and the cache."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+        self._session = None
+
+        if self.cache is not None:
+            self.cache.close()
+
+    async def _get(self, path: str, *, kind: str, json: bool = False) -> Any:
+        try:
+            with REQUEST_SECONDS.time(kind=kind):
+                return await self._request(path, json=json)
+        except DictionaryError:
+            REQUEST_ERRORS.inc(kind=kind)
+            raise
+
+    async def _request(self, path: str, *, json: bool) -> Any:
+        url = f"{self.base_url}{path}"
+
+        if self._bucket is not None:
+            await self._bucket.acquire()
+
+        async with self._semaphore:
+            _log.debug(f"GET {url}")
+
+            try:
+                async with self.session.get(url) as response:
+                    if response.status != 200:
+                        raise DictionaryError(
+                            f"{url} returned status {response.status}"
+                        )
+
+                    if json:
+                        return await response.json(content_type=None)
+
+                    return await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                raise DictionaryError(f"request to {url} failed") from exc
+
+    async def _lookup[T: BaseModel](
+        self,
+        kind: str,
+        query: str,
+        model: type[T],
+        fetch: Callable[[str], Awaitable[T | None]],
+        local: Callable[[str], T | None] | None = None,
+    ) -> T | None:
+        key = (kind, normalize_query(query))
+        return await self._in_flight.do(
+            key, lambda: self._lookup_once(kind, query, model, fetch, local)
+        )
+
+    async def _lookup_once[T: BaseModel](
+        self,
+        kind: str,
+        query: str,
+        model: type[T],
+        fetch: Callable[[str], Awaitable[T | None]],
+        local: Callable[[str], T | None] | None,
+    ) -> T | None:
+        if self.cache is not None:
+            entry = await self.cache.get(kind, query)
+
+            if entry is not None:
+                _log.debug(
+                    f"Answered {kind} lookup {query!r} from the cache",
+                    extra={"cache_hit": True},
+                )
+
+                if entry.value is None:
+                    return None
+                return model.parse_raw(entry.value)
+
+        if local is not None and (response := local(query)) is not None:
+            return response
+
+        _log.debug(
+            f"Fetching {kind} lookup {query!r}", extra={"cache_hit": False}
+        )
+        response = await fetch(query)
+
+        if self.cache is not None:
+            value = response.json() if response is not None else None
+            await self.cache.set(kind, query, value)
+
+        return response
+
+    async def kanji(
+        self,
+        query: str,
+        /,
+        *,
+        local: bool = True,
+    ) -> KanjiRequest | None:
+        """Look up a single kanji.
+
+        The local index is consulted after the cache, since the entries it
+        builds have no example vocabulary and cached ones from jisho.org
+        do. Pass ``local=False`` to skip it, e.g. to fetch (and cache) the
+        full entry.
+
+        Returns ``None`` if jisho.org has no entry for the query.
+        """
+        from jisho_api.kanji.request import KanjiRequest
+
+        return await self._lookup(
+            "kanji",
+            query,
+            KanjiRequest,
+            self._fetch_kanji,
+            self.index.get if self.index is not None and local else None,
+        )
+
+    async def kanji_many(
+        self,
+        queries: Iterable[str],
+        /,
+    ) -> dict[str, KanjiRequest | None]:
+        """Look up several kanji at once.
+
+        Each distinct query is looked up once. Those found locally or in
+        the cache are answered right away, and the rest are fetched
+        concurrently (still at most ``max_concurrency`` at a time), so the
+        whole batch takes about as long as the slowest lookup.
+
+        Returns the responses keyed by query, in the order first given.
+        """
+        unique = list(dict.fromkeys(queries))
+        responses = await asyncio.gather(*map(self.kanji, unique))
+        return dict(zip(unique, responses))
+
+    async def word(self, query: str, /) -> WordRequest | None:
+        """Look up a word.
+
+        Returns ``None`` if jisho.org has no matching words.
+        """
+        from jisho_api.word.request import WordRequest
+
+        return await self._lookup("word", query, WordRequest, self._fetch_word)
+
+    async def sentence(self, query: str, /) -> SentenceRequest | None:
+        """Look up example sentences containing the query.
+
+        Returns ``None`` if jisho.org has no matching sentences.
+        """
+        from jisho_api.sentence.request import SentenceRequest
+
+        return await self._lookup(
+            "sentence", query, SentenceRequest, self._fetch_sentence
+        )
+
+    async def _fetch_kanji(self, query: str, /) -> KanjiRequest | None:
+        path = "/search/" + urllib.parse.quote(query + " #kanji")
+        content = await self._get(path, kind="kanji")
+        return await asyncio.to_thread(parse_kanji, query, content)
+
+    async def _fetch_word(self, query: str, /) -> WordRequest | None:
+        path = "/api/v1/search/words?keyword=" + urllib.parse.quote(query)
+        content = await self._get(path, kind="word", json=True)
+
+        from jisho_api.word.request import WordRequest
+
+        response = WordRequest(**content)
+        return response if len(response) else None
+
+    async def _fetch_sentence(self, query: str, /) -> SentenceRequest | None:
+        path = "/search/" + urllib.parse.quote(query + " #sentences")
+        content = await self._get(path, kind="sentence")
+        return await asyncio.to_thread(parse_sentences, content)
+
+
+def parse_kanji(kanji: str, content: bytes) -> KanjiRequest | None:
+    """Scrape a jisho.org kanji page into a :class:`KanjiRequest`.
+
+    This mirrors :meth:`jisho_api.kanji.Kanji.request` without the network
+    call, and is CPU-bound, so it should be run in a worker thread.
+    """
+    from bs4 import BeautifulSoup
+    from jisho_api.kanji import Kanji
+    from jisho_api.kanji.request import KanjiRequest
+
+    soup = BeautifulSoup(content, "html.parser")
+
+    try:
+        return KanjiRequest(
+            meta={"status": 200},
+            data={
+                "kanji": kanji,
+                "strokes": Kanji.strokes(soup),
+                "main_meanings": Kanji.main_meanings(soup),
+                "main_readings": Kanji.main_readings(soup),
+                "meta": Kanji.meta(soup),
+                "radical": Kanji.radical(soup),
+                "reading_examples": Kanji.reading_examples(soup),
+            },
+        )
+    except Exception:
+        # The scrapers raise all sorts of errors when the page does not
+        # contain a kanji entry (e.g., the query was not a kanji).
+        _log.debug(f"no kanji entry found for {kanji!r}", exc_info=True)
+        return None
+
+
+def parse_sentences(content: bytes) -> SentenceRequest | None:
+    """Scrape a jisho.org sentence search page into a
+    :class:`SentenceRequest`."""
+    from bs4 import BeautifulSoup
+    from jisho_api.sentence import Sentence
+    from jisho_api.sentence.request import SentenceRequest
+
+    soup = BeautifulSoup(content, "html.parser")
+    response = SentenceRequest(
+        meta={"status": 200},
+        data=Sentence.sentences(soup),
+    )
+    return response if len(response) else None
@@ -0,0 +1,137 @@
+"""Which events the bot asks Discord for, and how much of them it keeps.
+
+Every gateway intent makes Discord send (and discord.py cache) another
+kind of event: with all of them, the bot holds every member, presence and
+recent message of every guild it is in, and its memory grows with the
+size of those guilds rather than with how much it is used. The bot itself
+only needs messages (for prefix commands), so the default ``minimal``
+profile asks for just those and turns the member and message caches off.
+
+Cogs that need more declare it with a ``required_intents`` class
+attribute; the bot checks the loaded cogs against its profile during
+startup and logs what is missing.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import sys
+from typing import TYPE_CHECKING, Iterable
+
+import discord
+
+if TYPE_CHECKING:
+    from discord.ext import commands
+
+__all__ = (
+    "BASE_INTENTS",
+    "GatewayProfile",
+    "PROFILES",
+    "memory_report",
+    "required_intents",
+    "rss_bytes",
+)
+
+# What prefix commands need: the messages themselves (in guilds and DMs),
+# their content, and the guilds and channels they are sent in.
+BASE_INTENTS = discord.Intents(
+    guilds=True,
+    guild_messages=True,
+    dm_messages=True,
+    message_content=True,
+)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class GatewayProfile:
+    """The intents to identify with and what to cache of the events.
+
+    Parameters
+    ----------
+    intents: :class:`discord.Intents`
+        The events to receive.
+    member_cache_flags: :class:`discord.MemberCacheFlags`
+        Which members to keep in memory.
+    max_messages: :class:`int`, optional
+        How many messages to keep in memory, or ``None`` for none.
+    chunk_guilds_at_startup: :class:`bool`
+        Whether to download every guild's member list when connecting.
+    """
+
+    intents: discord.Intents
+    member_cache_flags: discord.MemberCacheFlags
+    max_messages: int | None
+    chunk_guilds_at_startup: bool
+
+    def client_options(self) -> dict[str, object]:
+        """The keyword arguments to pass to :class:`discord.Client`."""
+        return {
+            "intents": self.intents,
+            "member_cache_flags": self.member_cache_flags,
+            "max_messages": self.max_messages,
+            "chunk_guilds_at_startup": self.chunk_guilds_at_startup,
+        }
+
+
+PROFILES = {
+    "minimal": GatewayProfile(
+        intents=BASE_INTENTS,
+        member_cache_flags=discord.MemberCacheFlags.none(),
+        max_messages=None,
+        chunk_guilds_at_startup=False,
+    ),
+    # Everything discord.py offers, with its default caching.
+    "full": GatewayProfile(
+        intents=discord.Intents.all(),
+        member_cache_flags=discord.MemberCacheFlags.all(),
+        max_messages=1000,
+        chunk_guilds_at_startup=True,
+    ),
+}
+
+
+def required_intents(cogs: Iterable[commands.Cog], /) -> discord.Intents:
+    """Combine :data:`BASE_INTENTS` with the intents the cogs require."""
+    intents = discord.Intents(**dict(BASE_INTENTS))
+
+    for cog in cogs:
+        needed = getattr(cog, "required_intents", None)
+        if needed is not None:
+            intents.value |= needed.value
+
+    return intents
+
+
+def rss_bytes() -> int | None:
+    """Return the process' resident set size, if it can be found."""
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        pass  # Not Linux; fall back to the peak.
+
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+
+    # It's in bytes on macOS, but in KiB everywhere else.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def memory_report(client: discord.Client, /) -> str:
+    """Summarize how much the process and the gateway caches hold."""
+    members = sum(len(g.members) for g in client.guilds)
+    channels = sum(len(g.channels) for g in client.guilds)
+    messages = len(client.cached_messages)
+
+    rss = rss_bytes()
+    memory = f"{rss / 1024 / 1024:.1f} MiB RSS" if rss is not None else "?"
+
+    return (
+        f"{memory}; caching {len(client.guilds)} guilds, {channels} "
+        f"channels, {members} members, {len(client.users)} users and "
+        f"{messages} messages"
+    )
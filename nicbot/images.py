@@ -0,0 +1,201 @@
+"""Shrink PNG images before they are uploaded to Discord.
+
+Without any extra dependencies, :func:`optimize_png` is lossless: it drops
+metadata chunks that do not affect how the image looks and recompresses
+the pixel data as tightly as :mod:`zlib` allows. If Pillow is installed,
+images can also be scaled down to a maximum width.
+
+Optimizing a whole directory is spread across a process pool, since every
+image is independent and the work is CPU-bound::
+
+    python -m nicbot.assets optimize-strokes
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import io
+import os
+import pathlib
+import struct
+import zlib
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # Resizing is unavailable.
+
+__all__ = (
+    "OptimizeReport",
+    "optimize_directory",
+    "optimize_png",
+)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Ancillary chunks that change how the pixels are displayed. Everything else
+# (text, timestamps, physical dimensions, etc.) is safe to drop.
+KEEP_CHUNKS = frozenset(
+    {b"IHDR", b"PLTE", b"IDAT", b"IEND", b"tRNS", b"gAMA", b"cHRM", b"sRGB"}
+)
+
+# zlib settings to try when recompressing; the smallest result wins.
+ZLIB_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+
+
+def _chunks(data: bytes) -> list[tuple[bytes, bytes]]:
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG image")
+
+    chunks = []
+    position = len(PNG_SIGNATURE)
+
+    while position < len(data):
+        (length,) = struct.unpack_from(">I", data, position)
+        kind = data[position + 4 : position + 8]
+        chunks.append((kind, data[position + 8 : position + 8 + length]))
+        # Length, type, data, then a 4 byte CRC.
+        position += 12 + length
+
+    return chunks
+
+
+def _chunk(kind: bytes, body: bytes) -> bytes:
+    crc = zlib.crc32(kind + body)
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", crc)
+
+
+def _compress(raw: bytes) -> bytes:
+    candidates = []
+
+    for strategy in ZLIB_STRATEGIES:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        candidates.append(compressor.compress(raw) + compressor.flush())
+
+    return min(candidates, key=len)
+
+
+def _resize(data: bytes, max_width: int) -> bytes:
+    if Image is None:
+        raise RuntimeError("resizing images requires Pillow to be installed")
+
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width <= max_width:
+            return data
+
+        height = round(image.height * max_width / image.width)
+        resized = image.resize((max_width, height), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        resized.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+def optimize_png(data: bytes, /, *, max_width: int | None = None) -> bytes:
+    """Return a smaller encoding of a PNG image.
+
+    If nothing could be saved, the original bytes are returned.
+
+    Parameters
+    ----------
+    data: :class:`bytes`
+        The PNG image.
+    max_width: :class:`int` | ``None``, optional
+        Scale the image down to at most this many pixels wide, keeping its
+        aspect ratio. Requires Pillow.
+    """
+    source = _resize(data, max_width) if max_width is not None else data
+    chunks = _chunks(source)
+
+    # Image data may be split across several IDAT chunks; it is one zlib
+    # stream, so it's recompressed as a whole and written back as one chunk.
+    raw = zlib.decompress(b"".join(b for k, b in chunks if k == b"IDAT"))
+    idat = _compress(raw)
+
+    output = [PNG_SIGNATURE]
+
+    for kind, body in chunks:
+        if kind == b"IDAT":
+            if idat:
+                output.append(_chunk(kind, idat))
+                idat = b""
+        elif kind in KEEP_CHUNKS:
+            output.append(_chunk(kind, body))
+
+    optimized = b"".join(output)
+    return optimized if len(optimized) < len(data) else data
+
+
+@dataclasses.dataclass(slots=True)
+class OptimizeReport:
+    files: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self) -> str:
+        mib = 1024 * 1024
+        percent = (
+            self.bytes_saved / self.bytes_before * 100
+            if self.bytes_before
+            else 0.0
+        )
+        return (
+            f"Optimized {self.files} images: "
+            f"{self.bytes_before / mib:.1f} MiB -> "
+            f"{self.bytes_after / mib:.1f} MiB "
+            f"(saved {self.bytes_saved / mib:.1f} MiB, {percent:.1f}%)"
+        )
+
+
+def _optimize_file(
+    source: pathlib.Path,
+    destination: pathlib.Path,
+    max_width: int | None,
+) -> tuple[int, int]:
+    data = source.read_bytes()
+    optimized = optimize_png(data, max_width=max_width)
+    destination.write_bytes(optimized)
+    return len(data), len(optimized)
+
+
+def optimize_directory(
+    source: pathlib.Path,
+    destination: pathlib.Path,
+    *,
+    max_width: int | None = None,
+    workers: int | None = None,
+) -> OptimizeReport:
+    """Write an optimized copy of every PNG image in ``source`` to
+    ``destination``, using a pool of ``workers`` processes (by default,
+    one per CPU core)."""
+    if max_width is not None and Image is None:
+        # Fail now rather than once in every worker process.
+        raise RuntimeError("resizing images requires Pillow to be installed")
+
+    destination.mkdir(parents=True, exist_ok=True)
+    files = sorted(source.glob("*.png"))
+    report = OptimizeReport()
+    workers = workers or os.cpu_count() or 1
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            _optimize_file,
+            files,
+            [destination.joinpath(f.name) for f in files],
+            [max_width] * len(files),
+            # Hand out images in batches to keep the inter-process overhead
+            # down.
+            chunksize=max(1, len(files) // (workers * 8)),
+        )
+
+        for before, after in results:
+            report.files += 1
+            report.bytes_before += before
+            report.bytes_after += after
+
+    return report
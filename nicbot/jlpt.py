@@ -0,0 +1,78 @@
+"""Indexed access to the JLPT kanji lists in ``data/kanji.json``.
+
+The file maps each JLPT level to a list of kanji. :class:`JLPTIndex` keeps
+that mapping (as tuples) alongside the reverse mappings, so finding the
+level of a kanji is a dictionary lookup instead of a scan over every list.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import pathlib
+from typing import Mapping, Sequence
+
+__all__ = (
+    "JLPTIndex",
+    "load_jlpt_index",
+)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class JLPTIndex:
+    """The JLPT kanji lists, indexed both ways.
+
+    Attributes
+    ----------
+    levels: :class:`dict` [:class:`str`, :class:`tuple` [:class:`str`, ...]]
+        Maps each level (e.g., ``"N5"``) to its kanji, in file order.
+    by_kanji: :class:`dict` [:class:`str`, :class:`str`]
+        Maps each kanji to its level.
+    by_codepoint: :class:`dict` [:class:`int`, :class:`str`]
+        Maps each kanji's Unicode code point to its level.
+    """
+
+    levels: dict[str, tuple[str, ...]]
+    by_kanji: dict[str, str]
+    by_codepoint: dict[int, str]
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Sequence[str]], /) -> JLPTIndex:
+        levels = {level: tuple(kanji) for level, kanji in data.items()}
+        by_kanji = {
+            kanji: level
+            for level, values in levels.items()
+            for kanji in values
+        }
+        by_codepoint = {ord(kanji): level for kanji, level in by_kanji.items()}
+        return cls(levels=levels, by_kanji=by_kanji, by_codepoint=by_codepoint)
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        """The names of every level, in file order."""
+        return tuple(self.levels.keys())
+
+    def __contains__(self, kanji: object) -> bool:
+        return kanji in self.by_kanji
+
+    def __len__(self) -> int:
+        return len(self.by_kanji)
+
+    def kanji(self, level: str, /) -> tuple[str, ...]:
+        """Return every kanji in a level."""
+        return self.levels[level]
+
+    def level(self, kanji: str, /) -> str | None:
+        """Return the level of a kanji, or ``None`` if it is not listed."""
+        return self.by_kanji.get(kanji)
+
+    def level_of_codepoint(self, codepoint: int, /) -> str | None:
+        """Return the level of the kanji with the given code point, or
+        ``None`` if it is not listed."""
+        return self.by_codepoint.get(codepoint)
+
+
+def load_jlpt_index(path: pathlib.Path) -> JLPTIndex:
+    """Read a kanji list file into a :class:`JLPTIndex`."""
+    with open(path, "r", encoding="utf-8") as f:
+        return JLPTIndex.from_mapping(json.load(f))
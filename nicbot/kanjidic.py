@@ -0,0 +1,278 @@
+"""Offline kanji dictionary built from KANJIDIC2.
+
+Download ``kanjidic2.xml.gz`` from the EDRDG
+(https://www.edrdg.org/wiki/index.php/KANJIDIC_Project), then build the
+index the bot reads at runtime::
+
+    python -m nicbot.kanjidic path/to/kanjidic2.xml.gz
+
+The index is a compact JSON file in the ``data`` directory. Once it exists,
+:class:`KanjiIndex` answers kanji lookups locally and the network is only
+used for kanji it does not know about.
+
+.. note::
+
+    KANJIDIC2 does not contain example vocabulary, and its JLPT levels use
+    the pre-2010 four level system, so entries served from the index have
+    no reading examples and no JLPT level.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import pathlib
+import threading
+import xml.etree.ElementTree as ET
+from typing import IO, TYPE_CHECKING, Any, Iterator
+
+from .assets import data_path
+
+if TYPE_CHECKING:
+    from jisho_api.kanji.request import KanjiRequest
+
+__all__ = (
+    "KanjiIndex",
+    "build_index",
+)
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_PATH = data_path("kanjidic.json")
+
+# Bumped whenever the layout of an entry changes.
+INDEX_VERSION = 1
+
+# The Kangxi radicals are encoded in order starting at U+2F00.
+KANGXI_RADICALS_START = 0x2F00
+
+# Each entry is stored as a list to keep the file small. These are the
+# positions of each field.
+STROKES, GRADE, FREQUENCY, RADICAL, MEANINGS, KUN, ON = range(7)
+
+
+def _open(path: pathlib.Path) -> IO[bytes]:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _parse_character(element: ET.Element) -> tuple[str, list[Any]]:
+    literal = element.findtext("literal", "")
+    misc = element.find("misc")
+    assert misc is not None, literal
+
+    grade = misc.findtext("grade")
+    frequency = misc.findtext("freq")
+    radical = element.findtext("radical/rad_value[@rad_type='classical']")
+
+    meanings: list[str] = []
+    kun: list[str] = []
+    on: list[str] = []
+
+    for group in element.iterfind("reading_meaning/rmgroup"):
+        for reading in group.iterfind("reading"):
+            match reading.get("r_type"):
+                case "ja_kun":
+                    kun.append(reading.text or "")
+                case "ja_on":
+                    on.append(reading.text or "")
+
+        for meaning in group.iterfind("meaning"):
+            # Meanings without a language attribute are in English.
+            if meaning.get("m_lang") is None:
+                meanings.append(meaning.text or "")
+
+    entry = [
+        int(misc.findtext("stroke_count", "0")),
+        int(grade) if grade is not None else None,
+        int(frequency) if frequency is not None else None,
+        int(radical) if radical is not None else None,
+        meanings,
+        kun,
+        on,
+    ]
+
+    return literal, entry
+
+
+def iter_kanjidic(path: pathlib.Path, /) -> Iterator[tuple[str, list[Any]]]:
+    """Stream ``(kanji, entry)`` pairs out of a KANJIDIC2 XML file."""
+    with _open(path) as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            if element.tag != "character":
+                continue
+
+            yield _parse_character(element)
+
+            # Free the memory used by the character we just processed.
+            element.clear()
+
+
+def build_index(source: pathlib.Path, destination: pathlib.Path) -> int:
+    """Convert a KANJIDIC2 file into the index read by :class:`KanjiIndex`.
+
+    The index is written to a temporary file first and then moved into
+    place, so a running bot never sees a half-written index.
+
+    Returns the number of kanji written.
+    """
+    entries = dict(iter_kanjidic(source))
+    index = {"version": INDEX_VERSION, "kanji": entries}
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temporary = destination.with_name(destination.name + ".tmp")
+
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+
+    os.replace(temporary, destination)
+    return len(entries)
+
+
+class KanjiIndex:
+    """Looks up kanji in the local index built by :func:`build_index`.
+
+    The index is read from disk on first use. If it does not exist, every
+    lookup misses and callers should fall back to the network.
+
+    Parameters
+    ----------
+    path: :class:`pathlib.Path`, optional
+        The index file to read.
+    """
+
+    def __init__(self, path: pathlib.Path = DEFAULT_PATH) -> None:
+        self.path = path
+        self._entries: dict[str, list[Any]] | None = None
+        self._responses: dict[str, KanjiRequest] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Read the index from disk, if it hasn't been already.
+
+        This is safe to call from a worker thread to avoid blocking the
+        event loop at startup.
+        """
+        with self._lock:
+            if self._entries is not None:
+                return
+
+            if not self.path.exists():
+                _log.info(f"No local kanji index found at {self.path}")
+                self._entries = {}
+                return
+
+            with open(self.path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+
+            if index.get("version") != INDEX_VERSION:
+                _log.warning(
+                    f"Ignoring local kanji index {self.path}: expected "
+                    f"version {INDEX_VERSION}, got {index.get('version')}"
+                )
+                self._entries = {}
+                return
+
+            self._entries = index["kanji"]
+            _log.info(f"Loaded {len(self._entries)} kanji from {self.path}")
+
+    @property
+    def entries(self) -> dict[str, list[Any]]:
+        if self._entries is None:
+            self.load()
+        assert self._entries is not None
+        return self._entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, kanji: object) -> bool:
+        return kanji in self.entries
+
+    def get(self, kanji: str, /) -> KanjiRequest | None:
+        """Return the entry for a kanji in the same shape as
+        :meth:`nicbot.dictionary.DictionaryClient.kanji`, or ``None`` if
+        the kanji is not in the index."""
+        if (response := self._responses.get(kanji)) is not None:
+            return response
+
+        if (entry := self.entries.get(kanji)) is None:
+            return None
+
+        response = self._responses[kanji] = _to_response(kanji, entry)
+        return response
+
+
+def _to_response(kanji: str, entry: list[Any]) -> KanjiRequest:
+    from jisho_api.kanji.request import KanjiRequest
+
+    radical = entry[RADICAL]
+    basis = chr(KANGXI_RADICALS_START + radical - 1) if radical else ""
+
+    return KanjiRequest(
+        meta={"status": 200},
+        data={
+            "kanji": kanji,
+            "strokes": entry[STROKES],
+            "main_meanings": entry[MEANINGS],
+            "main_readings": {
+                "kun": entry[KUN] or None,
+                "on": entry[ON] or None,
+            },
+            "meta": {
+                "education": {
+                    "grade": entry[GRADE],
+                    "jlpt": None,
+                    "newspaper_rank": entry[FREQUENCY],
+                },
+                "dictionary_idxs": {},
+                "classifications": {},
+                "codepoints": {},
+                "readings": {
+                    "japanese": None,
+                    "chinese": None,
+                    "korean": None,
+                },
+            },
+            "radical": {
+                "alt_forms": None,
+                "meaning": "",
+                "parts": [],
+                "basis": basis,
+                "kangxi_order": radical,
+                "variants": None,
+            },
+            "reading_examples": None,
+        },
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m nicbot.kanjidic",
+        description="Build the local kanji index from a KANJIDIC2 file.",
+    )
+    parser.add_argument(
+        "source",
+        type=pathlib.Path,
+        help="Path to kanjidic2.xml (optionally gzipped)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=pathlib.Path,
+        default=DEFAULT_PATH,
+        help=f"Where to write the index (default: {DEFAULT_PATH})",
+    )
+    args = parser.parse_args()
+
+    count = build_index(args.source, args.output)
+    print(f"Wrote {count} kanji to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,29 @@
 # Additional information about customizing the terminal via ANSI escape codes:
 # https://en.wikipedia.org/wiki/ANSI_escape_code
 
+import atexit
+import concurrent.futures
 import datetime as dt
 import enum
+import gzip
+import json
 import logging
+import logging.handlers
 import os
 import pathlib
+import queue
+import re
+import shutil
 import sys
+import time
 
 from overrides import override
 
 FORCE_COLOR = os.getenv("FORCE_COLOR", False)
 
+# The logs directory lives at the same level as the nicbot directory.
+LOGS_DIR = pathlib.Path(__file__).parents[1].joinpath("logs")
+
 
 class Style(enum.IntEnum):
     RESET = 0
@@ -76,52 +88,432 @@ class ColorFormatter(logging.Formatter):
 
     @override
     def format(self, record: logging.LogRecord) -> str:
-        formatter = self.FORMATS.get(record.levelno)
+        formatter = self.FORMATS.get(
+            record.levelno, self.FORMATS[logging.DEBUG]
+        )
+
+        if not record.exc_info:
+            return formatter.format(record)
 
-        if formatter is None:
-            formatter = self.FORMATS[logging.DEBUG]
+        # The plain traceback is kept on the record, so the file handler
+        # doesn't have to format it again.
+        if not record.exc_text:
+            record.exc_text = formatter.formatException(record.exc_info)
 
         # Override the traceback to always print in red
+        text = record.exc_text
+        record.exc_text = f"\x1b[{TextColor.RED}m{text}\x1b[{Style.RESET}m"
+
+        try:
+            return formatter.format(record)
+        finally:
+            record.exc_text = text
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats each record as a single line of JSON.
+
+    Every line has ``time``, ``level``, ``logger`` and ``message``. The
+    fields in :attr:`CONTEXT_FIELDS` are included when they are passed to
+    the log call through ``extra``. Records at ``location_level`` or above
+    also record where they were logged from, and ``exception`` holds the
+    traceback, if any.
+    """
+
+    CONTEXT_FIELDS: tuple[str, ...] = (
+        "command",  # The qualified name of the command.
+        "guild",  # The ID of the guild the command was used in.
+        "latency",  # How long the command took, in milliseconds.
+        "cache_hit",  # Whether a lookup was answered from the cache.
+    )
+
+    def __init__(self, *, location_level: int = logging.WARNING) -> None:
+        super().__init__()
+        self.location_level = location_level
+        self._encode = json.JSONEncoder(
+            ensure_ascii=False,
+            separators=(",", ":"),
+            default=str,
+        ).encode
+        # Formatting the timestamp is the slowest part of a record, and
+        # most records share their second with the one before. Several
+        # threads may format at once, so the second and its text are read
+        # and replaced together, as one tuple.
+        self._second: tuple[int, str] = (-1, "")
+
+    def _time(self, created: float) -> str:
+        second, text = self._second
+
+        if second != int(created):
+            second = int(created)
+            text = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._second = (second, text)
+
+        return f"{text}.{int(created % 1 * 1000):03d}Z"
+
+    @override
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, object] = {
+            "time": self._time(record.created),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        attributes = record.__dict__
+
+        for field in self.CONTEXT_FIELDS:
+            if (value := attributes.get(field)) is not None:
+                entry[field] = value
+
+        if record.levelno >= self.location_level:
+            entry["location"] = (
+                f"{record.module}:{record.funcName}:{record.lineno}"
+            )
+
         if record.exc_info:
-            text = formatter.formatException(record.exc_info)
-            record.exc_text = f"\x1b[{TextColor.RED}m{text}\x1b[{Style.RESET}m"
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            entry["exception"] = record.exc_text
+
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+
+        return self._encode(entry)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a :class:`logging.handlers.QueueListener` without
+    ever blocking the caller.
+
+    When the queue is full, new records below ``ERROR`` are dropped. Errors
+    wait up to :attr:`ERROR_TIMEOUT` seconds for room instead, since losing
+    them is worse than a short stall.
+    """
+
+    ERROR_TIMEOUT = 1.0
+
+    def __init__(self, maxsize: int) -> None:
+        super().__init__(queue.Queue(maxsize))
+        self.enqueued = 0
+        self.dropped = 0
+
+    @override
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The default implementation copies and formats the whole record
+        # here, on the caller's thread. Only merge the arguments into the
+        # message, so later changes to them don't show up in the log, and
+        # leave the rest (including tracebacks) to the listener's thread.
+        # This is the root logger's only handler, so nothing else sees the
+        # record after this.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    @override
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno < logging.ERROR:
+                self.dropped += 1
+                return
+
+            try:
+                self.queue.put(record, timeout=self.ERROR_TIMEOUT)
+            except queue.Full:
+                self.dropped += 1
+                return
+
+        self.enqueued += 1
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """A :class:`logging.handlers.QueueListener` that can be stopped while
+    its (bounded) queue is full."""
+
+    @override
+    def enqueue_sentinel(self) -> None:
+        # Wait for room instead of raising `queue.Full`.
+        self.queue.put(self._sentinel)
+
+
+# Matches both the active log file and its archives, e.g. "2024-01-31.log",
+# "2024-01-31.2.log" and "2024-01-31.2.log.gz".
+LOG_FILENAME = re.compile(
+    r"^(?P<date>\d{4}-\d{2}-\d{2})(?:\.(?P<part>\d+))?\.log(?:\.gz)?$"
+)
+
+
+class DailyRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """Writes to ``<directory>/YYYY-MM-DD.log`` for the current day.
+
+    At midnight, logging moves on to the next day's file. A file that grows
+    past ``max_bytes`` is renamed to ``YYYY-MM-DD.<n>.log`` and a new one is
+    started. Files that are no longer written to are gzipped on a separate
+    thread, and archives older than ``retention_days`` (or beyond the
+    newest ``backup_count``) are deleted.
+
+    Parameters
+    ----------
+    directory: :class:`pathlib.Path`
+        Where to write the log files.
+    max_bytes: :class:`int`, optional
+        The size at which to start a new file. ``0`` disables this.
+    retention_days: :class:`int`, optional
+        The number of days to keep archives for. ``0`` keeps them forever.
+    backup_count: :class:`int`, optional
+        The most archives to keep. ``0`` keeps every archive.
+    compress: :class:`bool`, optional
+        Whether to gzip archives.
+    """
+
+    def __init__(
+        self,
+        directory: pathlib.Path,
+        *,
+        max_bytes: int = 0,
+        retention_days: int = 0,
+        backup_count: int = 0,
+        compress: bool = True,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.backup_count = backup_count
+        self.compress = compress
+
+        self._day = dt.date.today()
+        self._next_day = self._midnight_after(self._day)
+        self._archiver = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="log-archiver"
+        )
 
-        output = formatter.format(record)
+        super().__init__(self._path(self._day), mode="a", encoding="utf-8")
 
-        # Remove the cache layer
-        record.exc_text = None
-        return output
+        # Archive whatever earlier runs left behind.
+        self._archiver.submit(self._archive, None)
 
+    def _path(self, day: dt.date) -> pathlib.Path:
+        return self.directory.joinpath(f"{day.isoformat()}.log")
 
-def start_logging(level: int) -> None:
+    @staticmethod
+    def _midnight_after(day: dt.date) -> float:
+        tomorrow = day + dt.timedelta(days=1)
+        return time.mktime(tomorrow.timetuple())
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if record.created >= self._next_day:
+            return True
+
+        # Checked before the record is written, so a file can end up one
+        # record past the limit; this avoids formatting every record twice.
+        return (
+            self.max_bytes > 0
+            and self.stream is not None
+            and self.stream.tell() >= self.max_bytes
+        )
+
+    def doRollover(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None  # type: ignore[assignment]
+
+        today = dt.date.today()
+        finished = pathlib.Path(self.baseFilename)
+
+        if today == self._day:
+            # The file is too big; move it out of the way under the next
+            # free part number.
+            parts = [
+                int(m["part"])
+                for p in self.directory.iterdir()
+                if (m := LOG_FILENAME.match(p.name))
+                and m["date"] == today.isoformat()
+                and m["part"]
+            ]
+            part = max(parts, default=0) + 1
+            rotated = finished.with_name(f"{today.isoformat()}.{part}.log")
+            os.replace(finished, rotated)
+        else:
+            rotated = finished
+
+        self._day = today
+        self._next_day = self._midnight_after(today)
+        self.baseFilename = os.fspath(self._path(today))
+        self.stream = self._open()
+
+        self._archiver.submit(self._archive, rotated)
+
+    def _archive(self, rotated: pathlib.Path | None) -> None:
+        try:
+            if self.compress:
+                self._compress_stale(rotated)
+            self._prune()
+        except OSError:
+            # Never take the bot down over log housekeeping.
+            logging.getLogger(__name__).warning(
+                "unable to archive log files", exc_info=True
+            )
+
+    def _is_active(self, path: pathlib.Path) -> bool:
+        # Compared by name rather than against `baseFilename`, which the
+        # writing thread may change at any moment.
+        match = LOG_FILENAME.match(path.name)
+        return (
+            match is not None
+            and match["part"] is None
+            and match["date"] >= self._day.isoformat()
+        )
+
+    def _compress_stale(self, rotated: pathlib.Path | None) -> None:
+        paths = (
+            [rotated]
+            if rotated is not None
+            else [
+                p
+                for p in self.directory.iterdir()
+                if p.suffix == ".log" and LOG_FILENAME.match(p.name)
+            ]
+        )
+
+        for path in paths:
+            if self._is_active(path) or not path.exists():
+                continue
+
+            temporary = path.with_name(path.name + ".gz.tmp")
+
+            with open(path, "rb") as src, gzip.open(temporary, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+            os.replace(temporary, path.with_name(path.name + ".gz"))
+            path.unlink()
+
+    def _prune(self) -> None:
+        archives = sorted(
+            (
+                # A day's unnumbered file was the last one written to.
+                (m["date"], int(m["part"] or sys.maxsize), p)
+                for p in self.directory.iterdir()
+                if (m := LOG_FILENAME.match(p.name)) and not self._is_active(p)
+            ),
+            reverse=True,
+        )
+
+        if self.retention_days > 0:
+            cutoff = dt.date.today() - dt.timedelta(days=self.retention_days)
+            expired = [a for a in archives if a[0] < cutoff.isoformat()]
+        else:
+            expired = []
+
+        if self.backup_count > 0:
+            expired.extend(archives[self.backup_count :])
+
+        for *_, path in expired:
+            path.unlink(missing_ok=True)
+
+    @override
+    def close(self) -> None:
+        # Let pending archiving finish before the process exits.
+        self._archiver.shutdown(wait=True)
+        super().close()
+
+
+def start_logging(
+    level: int,
+    *,
+    queue_size: int | None = 10_000,
+    directory: pathlib.Path = LOGS_DIR,
+    max_bytes: int = 10 * 1024 * 1024,
+    retention_days: int = 30,
+    backup_count: int = 100,
+    compress: bool = True,
+    json_lines: bool = False,
+) -> DroppingQueueHandler | None:
+    """Log to standard output and to a file in ``directory``.
+
+    The log file is rotated daily and whenever it reaches ``max_bytes``;
+    see :class:`DailyRotatingFileHandler` for the remaining options.
+
+    By default, records are put on a queue of at most ``queue_size``
+    records and written by a background thread, so logging never waits on
+    the terminal or the disk. Pass ``None`` to write records on the
+    calling thread instead.
+
+    If ``json_lines`` is true, every record is written as a line of JSON
+    (see :class:`JSONFormatter`) instead of text.
+
+    Returns the queue handler (to read its counters), if there is one.
+    """
     fix_logging_level_names()
 
-    formatter = logging.Formatter(
-        fmt="%(asctime)s %(levelname)s %(name)s] %(message)s",
-        datefmt="%Y-%m-%dT%H:%M:%S%z",  # ISO 8601 format
-    )
+    formatter: logging.Formatter
+
+    if json_lines:
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter(
+            fmt="%(asctime)s %(levelname)s %(name)s] %(message)s",
+            datefmt="%Y-%m-%dT%H:%M:%S%z",  # ISO 8601 format
+        )
 
     # Logging to standard output:
     stream_handler = logging.StreamHandler(sys.stdout)
     stream_handler.setFormatter(
-        ColorFormatter() if terminal_suppors_color(sys.stdout) else formatter
+        ColorFormatter()
+        if not json_lines and terminal_suppors_color(sys.stdout)
+        else formatter
     )
 
-    logging.root.addHandler(stream_handler)
-
     # Logging to the "logs" directory:
+    if not directory.exists():
+        directory.mkdir()
 
-    # The logs directory lives at the same level as the nicbot directory.
-    logs_dirpath = pathlib.Path(__file__).parents[1].joinpath("logs")
+    file_handler = DailyRotatingFileHandler(
+        directory,
+        max_bytes=max_bytes,
+        retention_days=retention_days,
+        backup_count=backup_count,
+        compress=compress,
+    )
+    file_handler.setFormatter(formatter)
 
-    if not logs_dirpath.exists():
-        logs_dirpath.mkdir()
+    logging.root.setLevel(level)
 
-    today = dt.datetime.now()
-    log_filepath = logs_dirpath.joinpath(today.strftime("%Y-%m-%d.log"))
+    if queue_size is None:
+        logging.root.addHandler(stream_handler)
+        logging.root.addHandler(file_handler)
+        return None
 
-    file_handler = logging.FileHandler(log_filepath, mode="a")
-    file_handler.setFormatter(formatter)
+    queue_handler = DroppingQueueHandler(queue_size)
+    listener = DrainingQueueListener(
+        queue_handler.queue,
+        stream_handler,
+        file_handler,
+        respect_handler_level=True,
+    )
+    listener.start()
+    queue_handler.listener = listener
 
-    logging.root.addHandler(file_handler)
-    logging.root.setLevel(level)
+    # Flush whatever is still queued when the program exits.
+    atexit.register(stop_logging)
+
+    logging.root.addHandler(queue_handler)
+    return queue_handler
+
+
+def stop_logging() -> None:
+    """Remove the handlers added by :func:`start_logging`, waiting for the
+    background thread (if any) to write out every queued record."""
+    for handler in logging.root.handlers[:]:
+        logging.root.removeHandler(handler)
+
+        if isinstance(handler, logging.handlers.QueueHandler):
+            if (listener := handler.listener) is not None:
+                listener.stop()
+                handler.listener = None
+
+                for h in listener.handlers:
+                    h.close()
+
+        handler.close()
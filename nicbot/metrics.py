@@ -0,0 +1,294 @@
+"""Timing histograms for commands and the work they do.
+
+Metrics are registered once, at import time, in the module that records
+them, and collected in :data:`REGISTRY`. Owners can read a summary with
+``!stats``, and setting ``METRICS_PORT`` serves every metric at
+``http://127.0.0.1:<port>/metrics`` in the Prometheus text format, so it
+can be scraped or simply ``curl``-ed.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import math
+import os
+import time
+from typing import Any, Iterator
+
+from aiohttp import web
+
+__all__ = (
+    "Counter",
+    "Histogram",
+    "MetricsServer",
+    "REGISTRY",
+    "Registry",
+    "counter",
+    "histogram",
+)
+
+# In seconds; from a memory hit up to a request that is about to time out.
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+type Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"')
+
+
+def _format_labels(names: Labels, values: Labels, **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    """A count that only goes up, per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, /, **labels: str) -> None:
+        key = tuple(labels[n] for n in self.label_names)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(tuple(labels[n] for n in self.label_names), 0)
+
+    def series(self) -> dict[Labels, float]:
+        return dict(self._values)
+
+    def render(self) -> Iterator[str]:
+        for values, total in sorted(self._values.items()):
+            labels = _format_labels(self.label_names, values)
+            yield f"{self.name}{labels} {total:g}"
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int) -> None:
+        # One count per bucket, plus the implicit +Inf bucket.
+        self.counts = [0] * (size + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Counts observations into buckets, per combination of label values.
+
+    Quantiles are estimated from the buckets the same way Prometheus'
+    ``histogram_quantile`` does, by interpolating within the bucket the
+    quantile falls in, so they are only as precise as the buckets.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = buckets
+        self._series: dict[Labels, _Series] = {}
+
+    def observe(self, value: float, /, **labels: str) -> None:
+        key = tuple(labels[n] for n in self.label_names)
+
+        if (series := self._series.get(key)) is None:
+            series = self._series[key] = _Series(len(self.buckets))
+
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe how long the body of a ``with`` block takes."""
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def series(self) -> list[Labels]:
+        return sorted(self._series)
+
+    def count(self, **labels: str) -> int:
+        key = tuple(labels[n] for n in self.label_names)
+        series = self._series.get(key)
+        return series.count if series is not None else 0
+
+    def quantile(self, q: float, /, **labels: str) -> float:
+        """Estimate the ``q``-quantile (e.g., ``0.95``) of the observations.
+
+        Returns ``nan`` if nothing has been observed.
+        """
+        key = tuple(labels[n] for n in self.label_names)
+
+        if (series := self._series.get(key)) is None or not series.count:
+            return math.nan
+
+        rank = q * series.count
+        seen = 0
+
+        for i, count in enumerate(series.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    # Past the last bucket; there is no upper bound to
+                    # interpolate towards.
+                    return self.buckets[-1]
+
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - seen) / count
+
+            seen += count
+
+        return self.buckets[-1]
+
+    def render(self) -> Iterator[str]:
+        for values in self.series():
+            series = self._series[values]
+            cumulative = 0
+
+            for bound, count in zip((*self.buckets, math.inf), series.counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else f"{bound:g}"
+                labels = _format_labels(self.label_names, values, le=le)
+                yield f"{self.name}_bucket{labels} {cumulative}"
+
+            labels = _format_labels(self.label_names, values)
+            yield f"{self.name}_sum{labels} {series.sum:g}"
+            yield f"{self.name}_count{labels} {series.count}"
+
+
+class Registry:
+    """Collects metrics by name."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram] = {}
+
+    def register[M: (Counter, Histogram)](self, metric: M) -> M:
+        # Reloading an extension runs its module again; keep the existing
+        # metric (and everything it has recorded) instead of replacing it.
+        if (existing := self._metrics.get(metric.name)) is not None:
+            if type(existing) is not type(metric):
+                raise ValueError(f"{metric.name} is already registered")
+            return existing  # type: ignore[return-value]
+
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str, /) -> Counter | Histogram | None:
+        return self._metrics.get(name)
+
+    def __iter__(self) -> Iterator[Counter | Histogram]:
+        return iter(sorted(self._metrics.values(), key=lambda m: m.name))
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labels: Labels = ()) -> Counter:
+    """Create (or get the existing) counter in :data:`REGISTRY`."""
+    return REGISTRY.register(Counter(name, help, labels))
+
+
+def histogram(name: str, help: str, labels: Labels = ()) -> Histogram:
+    """Create (or get the existing) histogram in :data:`REGISTRY`."""
+    return REGISTRY.register(Histogram(name, help, labels))
+
+
+class MetricsServer:
+    """Serves a registry at ``/metrics`` on localhost.
+
+    Parameters
+    ----------
+    port: :class:`int`
+        The port to listen on.
+    registry: :class:`Registry`, optional
+        The metrics to serve.
+    """
+
+    def __init__(self, port: int, registry: Registry = REGISTRY) -> None:
+        self.port = port
+        self.registry = registry
+        self._runner: web.AppRunner | None = None
+
+    @classmethod
+    def from_env(cls) -> MetricsServer | None:
+        """Create a server from ``METRICS_PORT``, if it is set."""
+        if not (port := os.getenv("METRICS_PORT", "").strip()):
+            return None
+        return cls(int(port))
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.registry.render(),
+            content_type="text/plain",
+            charset="utf-8",
+        )
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> MetricsServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
@@ -0,0 +1,192 @@
+"""A read-only archive of small files, accessed through :mod:`mmap`.
+
+Thousands of tiny files cost an inode each, and serving one means an
+``open``/``stat``/``read``/``close`` round trip every time. A pack stores
+them back to back in a single file with an index up front; once the pack is
+mapped into memory, getting a file is a dictionary lookup that returns a
+:class:`memoryview` into the mapping without copying anything.
+
+Layout (all integers little-endian)::
+
+    header   magic (4 bytes), number of entries (u32)
+    index    per entry: offset (u64), length (u32), key length (u16), key
+    data     the contents of every entry, back to back
+"""
+
+from __future__ import annotations
+
+import io
+import mmap
+import os
+import pathlib
+import shutil
+import struct
+from typing import Iterable
+
+__all__ = (
+    "AssetPack",
+    "BufferReader",
+    "build_pack",
+)
+
+MAGIC = b"NPK\x01"
+HEADER = struct.Struct("<4sI")
+ENTRY = struct.Struct("<QIH")
+
+
+def _size(contents: bytes | pathlib.Path) -> int:
+    if isinstance(contents, bytes):
+        return len(contents)
+    return contents.stat().st_size
+
+
+def build_pack(
+    files: Iterable[tuple[str, bytes | pathlib.Path]],
+    destination: pathlib.Path,
+) -> int:
+    """Write ``(key, contents)`` pairs into a pack.
+
+    The contents can either be the bytes to store or the path to a file to
+    copy. The pack is written to a temporary file first and then moved into
+    place, so a running bot never sees a half-written pack.
+
+    Returns the number of entries written.
+    """
+    entries = [(key.encode(), contents) for key, contents in files]
+    index_size = sum(ENTRY.size + len(key) for key, _ in entries)
+    offset = HEADER.size + index_size
+
+    temporary = destination.with_name(destination.name + ".tmp")
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(entries)))
+
+        for key, contents in entries:
+            length = _size(contents)
+            f.write(ENTRY.pack(offset, length, len(key)))
+            f.write(key)
+            offset += length
+
+        # Copy the files one at a time rather than reading them all into
+        # memory first.
+        for _, contents in entries:
+            if isinstance(contents, bytes):
+                f.write(contents)
+            else:
+                with open(contents, "rb") as src:
+                    shutil.copyfileobj(src, f)
+
+    os.replace(temporary, destination)
+    return len(entries)
+
+
+class AssetPack:
+    """Maps a pack written by :func:`build_pack` into memory.
+
+    Parameters
+    ----------
+    path: :class:`pathlib.Path`
+        The pack to open.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+
+        with open(path, "rb") as f:
+            # The mapping stays valid after the file is closed.
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self._mmap)
+
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not an asset pack")
+
+        self._index: dict[str, tuple[int, int]] = {}
+        position = HEADER.size
+
+        for _ in range(count):
+            offset, length, key_length = ENTRY.unpack_from(
+                self._mmap, position
+            )
+            position += ENTRY.size
+            key = self._mmap[position : position + key_length].decode()
+            position += key_length
+            self._index[key] = (offset, length)
+
+        self._view = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def keys(self) -> Iterable[str]:
+        return self._index.keys()
+
+    def get(self, key: str, /) -> memoryview | None:
+        """Return the contents of an entry without copying them, or
+        ``None`` if the pack has no such entry."""
+        if (location := self._index.get(key)) is None:
+            return None
+
+        offset, length = location
+        return self._view[offset : offset + length]
+
+    def close(self) -> None:
+        """Unmap the pack.
+
+        This fails with :exc:`BufferError` while any view returned by
+        :meth:`get` is still alive.
+        """
+        self._view.release()
+        self._mmap.close()
+
+
+class BufferReader(io.BufferedIOBase):
+    """A read-only, seekable file object over a :class:`memoryview`.
+
+    Unlike :class:`io.BytesIO`, this does not copy the buffer up front,
+    so it can hand a view into an :class:`AssetPack` straight to
+    :class:`discord.File`.
+    """
+
+    def __init__(self, buffer: memoryview, /, name: str = "") -> None:
+        super().__init__()
+        self._buffer = buffer
+        self._position = 0
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+
+        self._position = max(0, offset)
+        return self._position
+
+    def read(self, size: int | None = -1, /) -> bytes:
+        start = self._position
+        end = len(self._buffer) if size is None or size < 0 else start + size
+        data = bytes(self._buffer[start:end])
+        self._position = min(end, len(self._buffer))
+        return data
+
+    def read1(self, size: int = -1, /) -> bytes:
+        return self.read(size)
+
+    def readinto(self, b: bytearray | memoryview, /) -> int:  # type: ignore
+        data = self._buffer[self._position : self._position + len(b)]
+        b[: len(data)] = data
+        self._position += len(data)
+        return len(data)
@@ -0,0 +1,172 @@
+"""Buttons for flipping through a list of results one page at a time.
+
+Every page is rendered from results that were already fetched, and only
+when it is first shown, so flipping pages never queries the dictionary
+again.
+"""
+
+from __future__ import annotations
+
+import collections
+import logging
+from typing import Callable, Sequence
+
+import discord
+
+__all__ = (
+    "Pager",
+    "PagerRegistry",
+)
+
+_log = logging.getLogger(__name__)
+
+
+class Pager[T](discord.ui.View):
+    """A message with buttons to move between pages.
+
+    Parameters
+    ----------
+    entries: :class:`Sequence`
+        The results to page through, one per page.
+    render: :class:`Callable`
+        Turns a result into the text of its page.
+    author_id: :class:`int`
+        The ID of the user allowed to flip pages.
+    timeout: :class:`float`, optional
+        The number of seconds without interaction after which the buttons
+        stop working and the rendered pages are dropped.
+    """
+
+    def __init__(
+        self,
+        entries: Sequence[T],
+        render: Callable[[T], str],
+        *,
+        author_id: int,
+        timeout: float = 300.0,
+    ) -> None:
+        super().__init__(timeout=timeout)
+        self.entries = entries
+        self.render = render
+        self.author_id = author_id
+        self.page = 0
+        self.message: discord.Message | None = None
+        self.on_expire: Callable[[Pager[T]], None] | None = None
+
+        self._rendered: dict[int, str] = {}
+        self._update_buttons()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def content(self) -> str:
+        """The text of the current page."""
+        if (text := self._rendered.get(self.page)) is None:
+            text = self.render(self.entries[self.page])
+
+            if len(self.entries) > 1:
+                text += f"\n-# Page {self.page + 1}/{len(self.entries)}"
+
+            self._rendered[self.page] = text
+
+        return text
+
+    def _update_buttons(self) -> None:
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= len(self.entries) - 1
+
+    async def _show(self, interaction: discord.Interaction, page: int) -> None:
+        self.page = page
+        self._update_buttons()
+        await interaction.response.edit_message(
+            content=self.content(), view=self
+        )
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(
+        self,
+        interaction: discord.Interaction,
+        button: discord.ui.Button[Pager[T]],
+    ) -> None:
+        await self._show(interaction, max(self.page - 1, 0))
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(
+        self,
+        interaction: discord.Interaction,
+        button: discord.ui.Button[Pager[T]],
+    ) -> None:
+        await self._show(interaction, min(self.page + 1, len(self) - 1))
+
+    async def interaction_check(
+        self, interaction: discord.Interaction
+    ) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message(
+                "Only the person who searched can flip pages.",
+                ephemeral=True,
+            )
+            return False
+
+        return True
+
+    async def expire(self) -> None:
+        """Stop responding to the buttons and drop the rendered pages."""
+        self.stop()
+        self._rendered.clear()
+
+        if self.on_expire is not None:
+            self.on_expire(self)
+
+        if self.message is None:
+            return
+
+        for item in self.children:
+            if isinstance(item, discord.ui.Button):
+                item.disabled = True
+
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException:
+            _log.debug("unable to disable pager buttons", exc_info=True)
+
+    async def on_timeout(self) -> None:
+        await self.expire()
+
+
+class PagerRegistry:
+    """Keeps track of the active pagers, by message ID.
+
+    At most ``max_size`` pagers are kept; when another one is added, the
+    oldest is expired early to free its results.
+    """
+
+    def __init__(self, max_size: int = 100) -> None:
+        self.max_size = max_size
+        self._pagers: collections.OrderedDict[int, Pager] = (
+            collections.OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._pagers)
+
+    def get(self, message_id: int, /) -> Pager | None:
+        return self._pagers.get(message_id)
+
+    async def add(self, pager: Pager, message: discord.Message) -> None:
+        pager.message = message
+        pager.on_expire = lambda p: self.discard(message.id)
+        self._pagers[message.id] = pager
+
+        while len(self._pagers) > self.max_size:
+            _, oldest = self._pagers.popitem(last=False)
+            await oldest.expire()
+
+    def discard(self, message_id: int, /) -> None:
+        self._pagers.pop(message_id, None)
+
+    async def clear(self) -> None:
+        """Expire every pager."""
+        while self._pagers:
+            _, pager = self._pagers.popitem(last=False)
+            await pager.expire()
@@ -0,0 +1,188 @@
+"""Keep bursts of commands from turning into bursts of upstream requests.
+
+Three layers work together:
+
+- :class:`CommandRateLimit` limits how often each user, and each guild as
+  a whole, may run the dictionary commands.
+- :class:`SingleFlight` lets concurrent identical lookups share a single
+  in-flight request instead of each sending their own.
+- :class:`TokenBucket` paces the requests that still reach jisho.org.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from discord.ext import commands
+
+__all__ = (
+    "CommandRateLimit",
+    "SingleFlight",
+    "TokenBucket",
+    "dictionary_rate_limit",
+)
+
+_log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allows up to ``rate`` operations per second on average, with bursts
+    of up to ``capacity`` operations.
+
+    Parameters
+    ----------
+    rate: :class:`float`
+        The number of tokens added back every second.
+    capacity: :class:`int` | ``None``, optional
+        The most tokens the bucket holds. Defaults to ``rate``, rounded up.
+    """
+
+    def __init__(self, rate: float, capacity: int | None = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.capacity = capacity or max(1, math.ceil(rate))
+        self.waited = 0
+        """The number of times :meth:`acquire` had to wait for a token."""
+
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available.
+
+        Returns ``0.0`` on success, otherwise the number of seconds until
+        the next token is available.
+        """
+        self._refill()
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self) -> None:
+        """Wait until a token is available, then take it."""
+        if not (delay := self.try_acquire()):
+            return
+
+        self.waited += 1
+        _log.debug(f"Rate limited; waiting {delay:.2f}s for a token")
+
+        while delay:
+            await asyncio.sleep(delay)
+            delay = self.try_acquire()
+
+
+class SingleFlight[K: Hashable, V]:
+    """Runs at most one call per key at a time.
+
+    While a call for some key is in flight, callers asking for the same key
+    wait for its result instead of starting their own. Callers being
+    cancelled does not cancel the shared call.
+    """
+
+    def __init__(self) -> None:
+        self.coalesced = 0
+        """The number of callers that joined a call already in flight."""
+
+        self._calls: dict[K, asyncio.Future[V]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: K, call: Callable[[], Awaitable[V]], /) -> V:
+        if (future := self._calls.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            future = self._calls[key] = asyncio.ensure_future(call())
+            future.add_done_callback(lambda f: self._forget(key, f))
+
+        return await asyncio.shield(future)
+
+    def _forget(self, key: K, future: asyncio.Future[V]) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+        # Mark the exception as retrieved, in case every caller was
+        # cancelled before the call finished.
+        if not future.cancelled():
+            future.exception()
+
+
+class CommandRateLimit:
+    """Limits how often commands may be used, per user and per guild.
+
+    Every command decorated with the same instance's :meth:`check` shares
+    its limits, so switching between commands doesn't get around them.
+    Direct messages count towards the sender's "guild" limit.
+
+    Parameters
+    ----------
+    user: :class:`tuple` [:class:`int`, :class:`float`]
+        How many commands a single user may use within a number of seconds.
+    guild: :class:`tuple` [:class:`int`, :class:`float`]
+        How many commands a whole guild may use within a number of seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        user: tuple[int, float],
+        guild: tuple[int, float],
+    ) -> None:
+        self.mappings = (
+            commands.CooldownMapping.from_cooldown(
+                *user, commands.BucketType.user
+            ),
+            commands.CooldownMapping.from_cooldown(
+                *guild, commands.BucketType.guild
+            ),
+        )
+
+    def check[T](self) -> Callable[[T], T]:
+        """A decorator that applies the limits to a command.
+
+        Raises :exc:`discord.ext.commands.CommandOnCooldown` when either
+        limit has been reached.
+        """
+
+        async def predicate(ctx: commands.Context[Any]) -> bool:
+            now = time.time()
+            buckets = [
+                (mapping, mapping.get_bucket(ctx.message, now))
+                for mapping in self.mappings
+            ]
+
+            # Only use up a token once every limit allows the command, so
+            # hitting the guild limit doesn't also count against the user.
+            for mapping, bucket in buckets:
+                if bucket is not None and bucket.get_tokens(now) == 0:
+                    retry_after = bucket.get_retry_after(now)
+                    raise commands.CommandOnCooldown(
+                        bucket, retry_after, mapping.type
+                    )
+
+            for _, bucket in buckets:
+                if bucket is not None:
+                    bucket.update_rate_limit(now)
+
+            return True
+
+        return commands.check(predicate)
+
+
+# Shared by the dictionary commands in the Jisho and KanjiOfTheDay cogs.
+dictionary_rate_limit = CommandRateLimit(user=(5, 15.0), guild=(20, 15.0))
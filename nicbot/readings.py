@@ -0,0 +1,105 @@
+"""Convert kana to kanji using the readings in the local kanji index.
+
+Every on'yomi and kun'yomi is normalized to hiragana and stored in one
+sorted list, so finding the kanji for a reading (or every reading that
+starts with some kana) is a binary search rather than a network request.
+"""
+
+from __future__ import annotations
+
+import bisect
+import unicodedata
+from typing import Any, Mapping
+
+from .kanjidic import FREQUENCY, KUN, ON, STROKES
+
+__all__ = (
+    "ReadingIndex",
+    "to_hiragana",
+)
+
+# Katakana and hiragana are laid out in the same order, 0x60 apart.
+KATAKANA_START = 0x30A1
+KATAKANA_END = 0x30F6
+KATAKANA_TO_HIRAGANA = 0x60
+
+# Kanji without a frequency ranking sort after every kanji with one.
+UNRANKED = 1_000_000
+
+
+def to_hiragana(text: str, /) -> str:
+    """Normalize kana (including half-width katakana) to hiragana."""
+    text = unicodedata.normalize("NFKC", text)
+    return "".join(
+        (
+            chr(ord(c) - KATAKANA_TO_HIRAGANA)
+            if KATAKANA_START <= ord(c) <= KATAKANA_END
+            else c
+        )
+        for c in text
+    )
+
+
+def _normalize_reading(reading: str) -> str:
+    # KANJIDIC marks okurigana with "." (e.g., と.る) and affixes with "-".
+    return to_hiragana(reading.replace(".", "").replace("-", ""))
+
+
+class ReadingIndex:
+    """Finds kanji by their reading.
+
+    Use :meth:`from_entries` to build one from the local kanji index.
+    """
+
+    def __init__(
+        self, readings: list[tuple[str, int, int, str]] | None = None
+    ) -> None:
+        # (reading, frequency rank, stroke count, kanji), sorted.
+        self._readings = readings or []
+        self._keys = [reading for reading, *_ in self._readings]
+
+    @classmethod
+    def from_entries(
+        cls,
+        entries: Mapping[str, list[Any]],
+        /,
+    ) -> ReadingIndex:
+        """Build an index from :attr:`nicbot.kanjidic.KanjiIndex.entries`."""
+        readings = set()
+
+        for kanji, entry in entries.items():
+            rank = entry[FREQUENCY] or UNRANKED
+
+            for reading in (*entry[KUN], *entry[ON]):
+                if key := _normalize_reading(reading):
+                    readings.add((key, rank, entry[STROKES], kanji))
+
+        return cls(sorted(readings))
+
+    def __len__(self) -> int:
+        return len(self._readings)
+
+    def lookup(self, kana: str, /, *, limit: int = 10) -> list[str]:
+        """Return the kanji that can be read as ``kana``.
+
+        Kanji with exactly that reading come first, followed by kanji with
+        readings that start with it. Within each group, more frequently
+        used kanji come first.
+        """
+        key = to_hiragana(kana.strip())
+
+        if not key:
+            return []
+
+        start = bisect.bisect_left(self._keys, key)
+        # Every reading starting with the key sorts before this one.
+        end = bisect.bisect_left(self._keys, key + "\U0010ffff", lo=start)
+
+        matches = sorted(
+            self._readings[start:end],
+            key=lambda r: (r[0] != key, r[1], r[2]),
+        )
+
+        # A kanji can match through several readings; keep its best match.
+        candidates = dict.fromkeys(kanji for *_, kanji in matches)
+        return list(candidates)[:limit]
@@ -0,0 +1,352 @@
+"""Offline example sentences, from a Tatoeba sentence pairs file.
+
+Download the Japanese-English sentence pairs from Tatoeba
+(https://tatoeba.org/en/downloads, "Sentence pairs", as TSV), then build
+the index the bot reads at runtime::
+
+    python -m nicbot.sentences path/to/sentence_pairs.tsv
+
+Each line of the source is either ``id, japanese, id, english`` (as
+downloaded) or just ``japanese, english``, separated by tabs.
+
+The index is a single file in the ``data`` directory that is memory-mapped
+rather than read, so it costs no time at startup and only the pages that
+searches touch are ever loaded. Japanese isn't written with spaces, so
+instead of words the index maps every character and every pair of
+adjacent characters to the sentences containing them; a search intersects
+the lists for the pairs in the query and then checks the candidates.
+Sentences are numbered shortest first, which is the order results are
+ranked in, so a search can stop as soon as it has enough of them.
+
+Layout (all integers little-endian)::
+
+    header    magic (4 bytes), number of sentences (u32), number of
+              terms (u32), padding (u32)
+    terms     the terms' keys (u64), sorted
+    lists     per term: offset into postings (u32), length (u32)
+    offsets   per sentence, plus one: offset into text (u32)
+    postings  sentence numbers (u32)
+    text      every sentence as "japanese<TAB>english", in UTF-8
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import collections
+import dataclasses
+import itertools
+import logging
+import mmap
+import os
+import pathlib
+import struct
+import threading
+import unicodedata
+from array import array
+from typing import Iterable, Iterator
+
+from .assets import data_path
+
+__all__ = (
+    "Example",
+    "SentenceIndex",
+    "build_index",
+)
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_PATH = data_path("sentences.idx")
+
+MAGIC = b"NSI\x01"
+HEADER = struct.Struct("<4sIII")
+
+# Very short sentences (e.g., "猫！") make for poor examples, so they are
+# ranked after everything else.
+MIN_LENGTH = 6
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Example:
+    """An example sentence, shaped like jisho.org's
+    :class:`jisho_api.sentence.cfg.SentenceConfig`."""
+
+    japanese: str
+    en_translation: str
+
+
+def _normalize(text: str, /) -> str:
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _indexable(character: str, /) -> bool:
+    # Skip punctuation and spaces; nobody searches for them.
+    return unicodedata.category(character)[0] not in "PZC"
+
+
+def _segments(text: str, /) -> list[str]:
+    """Split ``text`` into the runs of characters :func:`_terms` keeps."""
+    return [
+        "".join(run)
+        for indexable, run in itertools.groupby(text, _indexable)
+        if indexable
+    ]
+
+
+def _key(first: str, second: str = "", /) -> int:
+    # Code points fit in 21 bits; a single character has no second one.
+    return ord(first) << 21 | (ord(second) if second else 0)
+
+
+def _terms(text: str, /) -> Iterator[int]:
+    """Yield the keys of every character and adjacent pair in ``text``."""
+    previous = ""
+
+    for character in text:
+        if not _indexable(character):
+            previous = ""
+            continue
+
+        yield _key(character)
+
+        if previous:
+            yield _key(previous, character)
+
+        previous = character
+
+
+def iter_sentence_pairs(path: pathlib.Path, /) -> Iterator[Example]:
+    """Read ``(japanese, english)`` pairs out of a Tatoeba-style TSV file."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            columns = line.rstrip("\n").split("\t")
+
+            if len(columns) == 4:
+                _, japanese, _, english = columns
+            elif len(columns) == 2:
+                japanese, english = columns
+            else:
+                continue
+
+            if japanese and english:
+                yield Example(japanese.strip(), english.strip())
+
+
+def build_index(source: Iterable[Example], destination: pathlib.Path) -> int:
+    """Write the index read by :class:`SentenceIndex`.
+
+    The index is written to a temporary file first and then moved into
+    place, so a running bot never sees a half-written index.
+
+    Returns the number of sentences written.
+    """
+    # Tatoeba lists a sentence once per translation; keep the first.
+    unique: dict[str, Example] = {}
+    for example in source:
+        unique.setdefault(example.japanese, example)
+
+    examples = sorted(
+        unique.values(),
+        key=lambda e: (len(e.japanese) < MIN_LENGTH, len(e.japanese)),
+    )
+
+    postings: collections.defaultdict[int, array[int]] = (
+        collections.defaultdict(lambda: array("I"))
+    )
+    offsets = array("I", [0])
+    text = bytearray()
+
+    for number, example in enumerate(examples):
+        for key in set(_terms(_normalize(example.japanese))):
+            postings[key].append(number)
+
+        text += f"{example.japanese}\t{example.en_translation}".encode()
+        offsets.append(len(text))
+
+    keys = array("Q", sorted(postings))
+    lists = array("I")
+    start = 0
+
+    for key in keys:
+        lists.extend((start, len(postings[key])))
+        start += len(postings[key])
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temporary = destination.with_name(destination.name + ".tmp")
+
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(examples), len(keys), 0))
+        f.write(keys.tobytes())
+        f.write(lists.tobytes())
+        f.write(offsets.tobytes())
+
+        for key in keys:
+            f.write(postings[key].tobytes())
+
+        f.write(text)
+
+    os.replace(temporary, destination)
+    return len(examples)
+
+
+class SentenceIndex:
+    """Searches the local index built by :func:`build_index`.
+
+    The index is mapped into memory on first use. If it does not exist,
+    every search comes back empty and callers should fall back to the
+    network.
+
+    Parameters
+    ----------
+    path: :class:`pathlib.Path`, optional
+        The index file to read.
+    """
+
+    def __init__(self, path: pathlib.Path = DEFAULT_PATH) -> None:
+        self.path = path
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._mmap: mmap.mmap | None = None
+        self._sentences = 0
+
+    def load(self) -> None:
+        """Map the index into memory, if it hasn't been already."""
+        with self._lock:
+            if self._loaded:
+                return
+
+            self._loaded = True
+
+            if not self.path.exists():
+                _log.info(f"No local sentence index found at {self.path}")
+                return
+
+            with open(self.path, "rb") as f:
+                # The mapping stays valid after the file is closed.
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, sentences, terms, _ = HEADER.unpack_from(self._mmap)
+
+            if magic != MAGIC:
+                _log.warning(f"Ignoring {self.path}: not a sentence index")
+                self._mmap.close()
+                self._mmap = None
+                return
+
+            view = memoryview(self._mmap)
+            position = HEADER.size
+
+            def section(size: int, format: str) -> memoryview:
+                nonlocal position
+                start, position = position, position + size
+                return view[start:position].cast(format)
+
+            self._sentences = sentences
+            self._keys = section(terms * 8, "Q")
+            self._lists = section(terms * 8, "I")
+            self._offsets = section((sentences + 1) * 4, "I")
+            self._postings = section(
+                (len(self._mmap) - position - self._offsets[-1]), "I"
+            )
+            self._text = view[position:]
+
+            _log.info(f"Mapped {sentences} sentences from {self.path}")
+
+    def __len__(self) -> int:
+        self.load()
+        return self._sentences
+
+    def _postings_for(self, key: int, /) -> memoryview:
+        i = bisect.bisect_left(self._keys, key)
+
+        if i == len(self._keys) or self._keys[i] != key:
+            return self._postings[:0]
+
+        start, length = self._lists[2 * i], self._lists[2 * i + 1]
+        return self._postings[start : start + length]
+
+    def _example(self, number: int, /) -> Example:
+        start, end = self._offsets[number], self._offsets[number + 1]
+        japanese, _, english = (
+            bytes(self._text[start:end]).decode().partition("\t")
+        )
+        return Example(japanese, english)
+
+    def search(self, query: str, /, *, limit: int = 10) -> list[Example]:
+        """Return up to ``limit`` sentences containing ``query``, the best
+        examples (the shortest ones) first."""
+        self.load()
+
+        if self._mmap is None:
+            return []
+
+        query = _normalize(query.strip())
+        keys = list(dict.fromkeys(_terms(query)))
+
+        if not keys:
+            return []
+
+        # A pair implies both of its characters, so only look at the single
+        # characters if there are no pairs.
+        if len(pairs := [k for k in keys if k & 0x1FFFFF]) > 0:
+            keys = pairs
+
+        # Unless the query is just the one character or pair being looked
+        # up, a sentence with every term in it may still not contain the
+        # query (e.g., the pairs could be in different places); check that
+        # it has every run of characters (e.g., both words of "日本 語").
+        segments = _segments(query)
+        verify = len(segments) > 1 or len(segments[0]) > 2
+
+        lists = sorted((self._postings_for(k) for k in keys), key=len)
+        shortest, others = lists[0], lists[1:]
+        results = []
+
+        for number in shortest:
+            if not all(_contains(other, number) for other in others):
+                continue
+
+            example = self._example(number)
+            if verify:
+                japanese = _normalize(example.japanese)
+                if not all(segment in japanese for segment in segments):
+                    continue
+
+            results.append(example)
+            if len(results) == limit:
+                break
+
+        return results
+
+
+def _contains(postings: memoryview, number: int, /) -> bool:
+    i = bisect.bisect_left(postings, number)
+    return i != len(postings) and postings[i] == number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m nicbot.sentences",
+        description="Build the local example sentence index.",
+    )
+    parser.add_argument(
+        "source",
+        type=pathlib.Path,
+        help="Path to a Tatoeba Japanese-English sentence pairs TSV file",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=pathlib.Path,
+        default=DEFAULT_PATH,
+        help=f"Where to write the index (default: {DEFAULT_PATH})",
+    )
+    args = parser.parse_args()
+
+    count = build_index(iter_sentence_pairs(args.source), args.output)
+    size = args.output.stat().st_size / 1024 / 1024
+    print(f"Wrote {count} sentences to {args.output} ({size:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Run the bot's shards across several processes.
+
+Discord splits a bot's guilds across shards, one gateway connection each.
+:class:`nicbot.bot.NicBot` can run any number of them in one process, but
+they all share one event loop (and so one CPU core); :func:`run_workers`
+instead starts a process per contiguous range of shards. The workers share
+everything on disk, like the dictionary's lookup cache, and each one logs
+to its own directory.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+
+__all__ = (
+    "IDENTIFY_INTERVAL",
+    "parse_shard_ids",
+    "run_workers",
+    "split_shards",
+)
+
+_log = logging.getLogger(__name__)
+
+# Discord only lets a bot connect (identify) one shard every 5 seconds.
+IDENTIFY_INTERVAL = 5.0
+
+# How long to wait before restarting a worker that crashed.
+RESTART_DELAY = 5.0
+
+# A worker exits with this when restarting it wouldn't help (e.g., the
+# token is wrong).
+FATAL_EXIT_CODE = 3
+
+
+def parse_shard_ids(text: str, /) -> list[int]:
+    """Parse shard IDs like ``0-3,8`` into ``[0, 1, 2, 3, 8]``."""
+    ids: list[int] = []
+
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        start = int(first)
+        stop = int(last) if last else start
+
+        if start < 0 or stop < start:
+            raise ValueError(f"invalid shard ID range: {part!r}")
+
+        ids.extend(range(start, stop + 1))
+
+    return sorted(set(ids))
+
+
+def split_shards(shard_ids: list[int], workers: int) -> list[list[int]]:
+    """Split shard IDs into (at most) ``workers`` contiguous runs of nearly
+    the same size."""
+    workers = max(1, min(workers, len(shard_ids)))
+    size, extra = divmod(len(shard_ids), workers)
+    runs = []
+    start = 0
+
+    for i in range(workers):
+        stop = start + size + (i < extra)
+        runs.append(shard_ids[start:stop])
+        start = stop
+
+    return runs
+
+
+def _worker_main(
+    token: str,
+    shard_ids: list[int],
+    shard_count: int,
+    index: int,
+    delay: float,
+    options: dict[str, Any],
+) -> None:
+    # Imported here: the worker is a fresh interpreter (see `run_workers`),
+    # and the parent doesn't need the bot itself.
+    import discord
+
+    from .bot import NicBot
+    from .gateway import PROFILES
+    from .logger import LOGS_DIR, start_logging
+
+    name = f"shards-{shard_ids[0]}-{shard_ids[-1]}"
+    start_logging(directory=LOGS_DIR.joinpath(name), **options["logging"])
+
+    # Give every worker its own metrics port, next to the configured one.
+    if port := os.getenv("METRICS_PORT", "").strip():
+        os.environ["METRICS_PORT"] = str(int(port) + index)
+
+    # Let the workers before this one connect their shards first.
+    time.sleep(delay)
+
+    bot = NicBot(
+        profile=PROFILES[options["gateway_profile"]],
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+    )
+
+    try:
+        bot.run(token, log_handler=None)
+    except (discord.LoginFailure, discord.PrivilegedIntentsRequired) as exc:
+        _log.critical(f"unable to connect: {exc}")
+        sys.exit(FATAL_EXIT_CODE)
+    except Exception:
+        _log.critical("the bot crashed", exc_info=True)
+        sys.exit(1)
+
+
+def run_workers(
+    token: str,
+    *,
+    shard_ids: list[int],
+    shard_count: int,
+    workers: int,
+    options: dict[str, Any],
+) -> None:
+    """Run the shards in ``shard_ids`` across ``workers`` processes.
+
+    Workers are started so that they connect one after another, and a
+    worker that crashes is started again (unless it couldn't connect at
+    all, e.g. because of a wrong token). This returns once every worker
+    has exited normally, or stops them all on :exc:`KeyboardInterrupt`.
+
+    Parameters
+    ----------
+    token: :class:`str`
+        The bot's token.
+    shard_ids: :class:`list`
+        The shards to run (e.g., ``range(shard_count)`` for all of them).
+    shard_count: :class:`int`
+        The total number of shards, across every process and machine.
+    workers: :class:`int`
+        The number of processes to run.
+    options: :class:`dict`
+        ``logging`` (keyword arguments for
+        :func:`nicbot.logger.start_logging`) and ``gateway_profile`` (the
+        name of a profile in :data:`nicbot.gateway.PROFILES`).
+    """
+    # Don't fork: the parent has threads (e.g., the log writer) whose locks
+    # could be copied while held.
+    context = multiprocessing.get_context("spawn")
+    runs = split_shards(shard_ids, workers)
+    processes: dict[int, BaseProcess] = {}
+
+    def start(index: int, delay: float) -> None:
+        process = context.Process(
+            target=_worker_main,
+            args=(token, runs[index], shard_count, index, delay, options),
+            name=f"nicbot-shards-{runs[index][0]}-{runs[index][-1]}",
+        )
+        process.start()
+        processes[index] = process
+        _log.info(f"Started {process.name} (pid {process.pid})")
+
+    delay = 0.0
+    for index, run in enumerate(runs):
+        start(index, delay)
+        delay += len(run) * IDENTIFY_INTERVAL
+
+    try:
+        while processes:
+            sentinels = {p.sentinel: i for i, p in processes.items()}
+            for sentinel in multiprocessing.connection.wait(sentinels):
+                index = sentinels[sentinel]  # type: ignore[index]
+                process = processes.pop(index)
+                process.join()
+
+                if process.exitcode == 0:
+                    _log.info(f"{process.name} exited")
+                    continue
+
+                if process.exitcode == FATAL_EXIT_CODE:
+                    _log.error(f"{process.name} failed to connect")
+                    continue
+
+                _log.error(
+                    f"{process.name} exited with code {process.exitcode}; "
+                    f"restarting it in {RESTART_DELAY:.0f}s"
+                )
+                start(index, RESTART_DELAY)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
@@ -0,0 +1,184 @@
+"""A local stand-in for jisho.org.
+
+:class:`StubJishoServer` answers the same URLs :class:`DictionaryClient`
+requests with small canned pages, after an artificial delay. This makes it
+possible to exercise the client (timeouts, concurrency limits, latency)
+without touching the network.
+
+Examples
+--------
+>>> async with StubJishoServer(latency=0.25) as server:
+...     async with DictionaryClient(base_url=server.url) as client:
+...         response = await client.kanji("鳥")
+"""
+
+from __future__ import annotations
+
+import asyncio
+import html
+from typing import Any
+
+from aiohttp import web
+
+__all__ = ("StubJishoServer",)
+
+KANJI_TEMPLATE = """\
+<html><body>
+<div class="kanji-details__stroke_count"><strong>{strokes}</strong></div>
+<div class="kanji-details__main-meanings">{meanings}</div>
+<div class="kanji-details__main-readings">
+<dl class="dictionary_entry kun_yomi">Kun:{kun}</dl>
+<dl class="dictionary_entry on_yomi">On:{on}</dl>
+</div>
+<div class="kanji_stats"></div>
+<table summary="Dictionary indices"></table>
+<section id="classifications"></section>
+<section id="codepoints"></section>
+<div class="kanji-details__readings row"></div>
+<div class="radicals"><span title="Kangxi radical 1)">one 一</span></div>
+<div class="radicals"><a>{kanji}</a></div>
+<ul class="no-bullet"><li>{kanji}【{reading}】 example</li></ul>
+<ul class="no-bullet"><li>{kanji}【{reading}】 example</li></ul>
+</body></html>
+"""
+
+SENTENCE_TEMPLATE = """\
+<html><body>
+<div class="sentence_content">
+<ul><li><span class="unlinked">{query}</span></li></ul>
+<span class="english">An example sentence.</span>
+</div>
+</body></html>
+"""
+
+
+class StubJishoServer:
+    """Serves canned jisho.org responses on localhost.
+
+    Parameters
+    ----------
+    latency: :class:`float`, optional
+        The number of seconds to wait before answering each request.
+    not_found: :class:`frozenset` [:class:`str`], optional
+        Queries the server should report as having no results.
+
+    Attributes
+    ----------
+    requests: :class:`int`
+        The total number of requests served.
+    in_flight: :class:`int`
+        The number of requests currently being answered.
+    max_in_flight: :class:`int`
+        The largest value ``in_flight`` has reached, which is useful to
+        check that the client's concurrency limit is respected.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        not_found: frozenset[str] = frozenset(),
+    ) -> None:
+        self.latency = latency
+        self.not_found = not_found
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        self._runner: web.AppRunner | None = None
+        self._port = 0
+
+    @property
+    def url(self) -> str:
+        """The base URL to pass to :class:`DictionaryClient`."""
+        return f"http://127.0.0.1:{self._port}"
+
+    async def __aenter__(self) -> StubJishoServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/search/{query}", self._search)
+        app.router.add_get("/api/v1/search/words", self._words)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+
+        # Port 0 lets the operating system pick any free port.
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+
+        server = site._server
+        assert server is not None and server.sockets
+        self._port = server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _delay(self) -> None:
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    async def _search(self, request: web.Request) -> web.Response:
+        await self._delay()
+        query, _, tag = request.match_info["query"].partition(" #")
+
+        if query in self.not_found:
+            return web.Response(text="<html></html>", content_type="text/html")
+
+        if tag == "kanji":
+            text = KANJI_TEMPLATE.format(
+                kanji=html.escape(query),
+                strokes=11,
+                meanings="stub, placeholder",
+                kun="とり",
+                on="チョウ",
+                reading="とり",
+            )
+        elif tag == "sentences":
+            text = SENTENCE_TEMPLATE.format(query=html.escape(query))
+        else:
+            raise web.HTTPNotFound()
+
+        return web.Response(text=text, content_type="text/html")
+
+    async def _words(self, request: web.Request) -> web.Response:
+        await self._delay()
+        keyword = request.query.get("keyword", "")
+        data = [] if keyword in self.not_found else [_word(keyword)]
+        return web.json_response({"meta": {"status": 200}, "data": data})
+
+
+def _word(keyword: str) -> dict[str, Any]:
+    return {
+        "slug": keyword,
+        "is_common": True,
+        "tags": [],
+        "jlpt": ["jlpt-n5"],
+        "japanese": [{"word": keyword, "reading": keyword}],
+        "senses": [
+            {
+                "english_definitions": ["stub"],
+                "parts_of_speech": ["Noun"],
+                "links": [],
+                "tags": [],
+                "restrictions": [],
+                "see_also": [],
+                "antonyms": [],
+                "source": [],
+                "info": [],
+            }
+        ],
+    }
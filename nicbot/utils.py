@@ -1,43 +1,67 @@
-import inspect
+import asyncio
+import importlib.util
 import logging
 import sys
+from typing import Any, Protocol, runtime_checkable
 
 from discord.ext import commands
 
-__all__ = ("auto_add_cogs",)
+__all__ = (
+    "StatefulCog",
+    "add_registered_cogs",
+    "hot_reload_extension",
+    "is_kana",
+    "is_kanji",
+    "register_cog",
+)
 
 _log = logging.getLogger(__name__)
 
 
-async def auto_add_cogs(bot: commands.Bot, *, name: str = "") -> None:
-    """Automatically discover which classes in a module subclass
-    :class:`discord.ext.commands.Cog` and add them to the bot instance.
+# Cog classes by the module that defines them, then by name. Loading an
+# extension runs its module again, which registers fresh classes, so the
+# entries are dropped once they've been added to the bot.
+_cogs: dict[str, dict[str, type[commands.Cog]]] = {}
 
-    .. warning::
 
-        This function inspects the caller's stack information to get
-        the module's `__name__` attribute, which makes it very fragile.
-        See the Examples section for intended usage.
+@runtime_checkable
+class StatefulCog(Protocol):
+    """A cog that keeps its state (caches, open pagers, etc.) when its
+    extension is reloaded with :func:`hot_reload_extension`.
+    """
 
-    Parameters
-    ----------
-    bot: :class:`discord.ext.commands.Bot`
-        The bot instance to add the cog(s) to
+    def export_state(self) -> dict[str, Any]:
+        """Hand over this cog's state to the next version of it.
+
+        This is called right before the cog is removed, so anything
+        returned should be detached from it (e.g., replaced with an empty
+        container); otherwise ``cog_unload`` would tear it down.
+        """
+        ...
+
+    def import_state(self, state: dict[str, Any], /) -> None:
+        """Take over the state of the previous version of this cog.
 
-    Other Parameters
-    ----------------
-    name: :class:`str`, optional
-        The module's `__name__` attribute. This is normally resolved for you
-        automatically, but if necessary, you can pass it manually here.
+        This is called before the cog is added to the bot. ``state`` comes
+        from the previous version's :meth:`export_state`, so it may be
+        missing keys that were added since.
+        """
+        ...
+
+
+def register_cog[C: type[commands.Cog]](cls: C, /) -> C:
+    """A class decorator that records a cog, so the module's ``setup``
+    function can add it to the bot with :func:`add_registered_cogs`.
 
     Examples
     --------
     >>> from discord.ext import commands
     >>>
-    >>> from ..utils import auto_add_cogs
+    >>> from ..utils import add_registered_cogs, register_cog
     >>>
     >>>
-    >>> class MyCog(commands.Cog):
+    >>> @register_cog
+    ... class MyCog(commands.Cog):
     ...     def __init__(self, bot: commands.Bot) -> None:
     ...         self.bot = bot
     ...
@@ -46,26 +70,162 @@ async def auto_add_cogs(bot: commands.Bot, *, name: str = "") -> None:
     >>>
     >>> # Required at the end of all extension modules.
     >>> async def setup(bot: commands.Bot, /) -> None:
-    ...     await auto_add_cogs(bot)
+    ...     await add_registered_cogs(bot, __name__)
     """
-    if not name:
-        caller = inspect.stack()[1]
-        module = inspect.getmodule(caller.frame)
-
-        if module is None:
-            raise ValueError(
-                "Failed to resolve module name automatically. Please use "
-                "the 'name' parameter to pass the module's __name__ attribute "
-                "manually (i.e., auto_add_cogs(bot, name=__name__)."
-            )
-
-        name = module.__name__
-        _log.debug(f"Automatically resolved cog module name: {name}")
-
-    # Returns the members of sys.modules[key] as ('name', <class Value>) pairs.
-    members = inspect.getmembers(sys.modules[name], inspect.isclass)
-    cogs = filter(lambda v: issubclass(v[1], commands.Cog), members)
-
-    for _, cog_type in cogs:
-        cog = cog_type(bot)
-        await bot.add_cog(cog)
+    _cogs.setdefault(cls.__module__, {})[cls.__qualname__] = cls
+    return cls
+
+
+async def add_registered_cogs(bot: commands.Bot, name: str, /) -> None:
+    """Add every cog registered with :func:`register_cog` in a module to the
+    bot instance.
+
+    Parameters
+    ----------
+    bot: :class:`discord.ext.commands.Bot`
+        The bot instance to add the cog(s) to
+    name: :class:`str`
+        The module's `__name__` attribute.
+    """
+    for cog_type in _cogs.pop(name, {}).values():
+        _log.debug(f"Adding cog {cog_type.__qualname__!r} from {name}")
+        await bot.add_cog(cog_type(bot))
+
+
+async def _swap_cogs(
+    bot: commands.Bot,
+    old: list[commands.Cog],
+    new: list[commands.Cog],
+    /,
+) -> None:
+    """Remove the ``old`` cogs and add the ``new`` ones, putting the old
+    ones back if any of the new ones can't be added."""
+    for cog in old:
+        await bot.remove_cog(cog.qualified_name)
+
+    added: list[commands.Cog] = []
+
+    try:
+        for cog in new:
+            await bot.add_cog(cog)
+            added.append(cog)
+    except Exception:
+        for cog in added:
+            await bot.remove_cog(cog.qualified_name)
+
+        # Let the old cogs' cancelled tasks finish before they're restarted.
+        await asyncio.sleep(0)
+
+        for cog in old:
+            await bot.add_cog(cog)
+
+        raise
+
+
+async def hot_reload_extension(
+    bot: commands.Bot,
+    name: str,
+    /,
+    *,
+    package: str | None = None,
+) -> None:
+    """Reload an extension without losing its cogs' state.
+
+    Unlike :meth:`discord.ext.commands.Bot.reload_extension` on its own:
+
+    1. The new version of the module is imported and its cogs are created
+       first, on the side, so a broken fix is reported without touching
+       the running version. These are the cogs that get added; the module
+       isn't imported again, and its ``setup`` function isn't called.
+    2. Cogs that implement :class:`StatefulCog` hand their state over to
+       the new cogs, so caches stay warm and open pagers keep working.
+    3. The old cogs are swapped for the new ones in one step. Neither
+       version's ``cog_unload``/``cog_load`` does any I/O once the state
+       is handed over, so the event loop never runs in between and no
+       command arrives while the cogs are missing. If a new cog can't be
+       added, the old cogs are put back with their state.
+
+    Parameters
+    ----------
+    bot: :class:`discord.ext.commands.Bot`
+        The bot instance the extension is loaded onto.
+    name: :class:`str`
+        The extension's name, like for ``reload_extension``.
+    package: :class:`str`, optional
+        The package to resolve a relative ``name`` against.
+
+    Raises
+    ------
+    discord.ext.commands.ExtensionError
+        The extension is not loaded, or the new version could not be
+        imported or its cogs created or added; the old version is left
+        running.
+    """
+    name = importlib.util.resolve_name(name, package)
+
+    if (previous := bot.extensions.get(name)) is None:
+        raise commands.ExtensionNotLoaded(name)
+
+    if (spec := importlib.util.find_spec(name)) is None:
+        raise commands.ExtensionNotFound(name)
+
+    try:
+        # Don't add it to `sys.modules` yet; the old version is still live.
+        module = importlib.util.module_from_spec(spec)
+        assert spec.loader is not None
+        spec.loader.exec_module(module)
+
+        new = [cog_type(bot) for cog_type in _cogs.pop(name, {}).values()]
+    except Exception as exc:
+        _cogs.pop(name, None)
+        raise commands.ExtensionFailed(name, exc) from exc
+
+    old = [cog for cog in bot.cogs.values() if cog.__module__ == name]
+    carried: dict[str, dict[str, Any]] = {}
+
+    for cog in old:
+        if isinstance(cog, StatefulCog):
+            carried[cog.qualified_name] = cog.export_state()
+
+    try:
+        for cog in new:
+            state = carried.get(cog.qualified_name)
+            if state is not None and isinstance(cog, StatefulCog):
+                cog.import_state(state)
+
+        await _swap_cogs(bot, old, new)
+    except Exception as exc:
+        for cog in old:
+            state = carried.get(cog.qualified_name)
+            if state is not None and isinstance(cog, StatefulCog):
+                cog.import_state(state)
+
+        raise commands.ExtensionFailed(name, exc) from exc
+
+    # discord.py has no public way to swap the module of a loaded
+    # extension; this is what `load_extension` records.
+    sys.modules[name] = module
+    bot._BotBase__extensions[name] = module  # type: ignore[attr-defined]
+
+    if (teardown := getattr(previous, "teardown", None)) is not None:
+        await teardown(bot)
+
+
+def is_kanji(character: str, /) -> bool:
+    """Check whether a single character is a kanji."""
+    value = ord(character)
+    return (
+        (0x4E00 <= value <= 0x9FFF)  # Common Kanji
+        or (0x3400 <= value <= 0x4DBF)  # Extension A
+        or (0xF900 <= value <= 0xFAFF)  # Compatibility Kanji
+    )
+
+
+def is_kana(character: str, /) -> bool:
+    """Check whether a single character is hiragana or katakana."""
+    value = ord(character)
+    return (
+        (0x3041 <= value <= 0x309F)  # Hiragana
+        or (0x30A0 <= value <= 0x30FF)  # Katakana
+        or (0xFF66 <= value <= 0xFF9F)  # Half-width Katakana
+    )